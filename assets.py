@@ -0,0 +1,51 @@
+import io
+import os
+
+import discord
+
+import config
+
+OPENDOTA_HERO_IMAGE_URL = "https://api.opendota.com/apps/dota2/images/dota_react/heroes/{key}.png"
+
+
+class HeroPortraits:
+    """
+    Hero portraits from images/, read into memory once so posting a thumbnail
+    never touches the disk. With a url_template set, thumbnails point at that
+    URL instead of being uploaded with every message.
+    """
+    def __init__(self, image_dir, url_template=None):
+        self.image_dir = image_dir
+        self.url_template = url_template
+        self._images = {}
+
+    def load(self):
+        """Reads every .png in image_dir. Safe to call again to pick up new files."""
+        images = {}
+        if os.path.isdir(self.image_dir):
+            for entry in os.scandir(self.image_dir):
+                if entry.is_file() and entry.name.endswith('.png'):
+                    try:
+                        with open(entry.path, 'rb') as f:
+                            images[entry.name[:-4]] = f.read()
+                    except OSError as e:
+                        print(f"WARNING: Could not read {entry.path}: {e}")
+        self._images = images
+        print(f"✅ Loaded {len(images)} hero portraits.")
+
+    def thumbnail(self, embed, h_key):
+        """Sets the hero portrait as the embed thumbnail. Returns the discord.File to attach, if any."""
+        if not h_key:
+            return None
+        if self.url_template:
+            embed.set_thumbnail(url=self.url_template.format(key=h_key))
+            return None
+        data = self._images.get(h_key)
+        if data is None:
+            embed.set_thumbnail(url=OPENDOTA_HERO_IMAGE_URL.format(key=h_key))
+            return None
+        embed.set_thumbnail(url=f"attachment://{h_key}.png")
+        return discord.File(io.BytesIO(data), filename=f"{h_key}.png")
+
+
+PORTRAITS = HeroPortraits(config.IMAGES_DIR, config.HERO_THUMBNAIL_URL)
@@ -0,0 +1,267 @@
+import asyncio
+import collections
+import hashlib
+import os
+
+import discord
+from discord.oggparse import OggStream
+
+# Ogg Opus header packets; they carry stream metadata, not audio
+_OPUS_HEADERS = (b'OpusHead', b'OpusTags')
+
+
+class OpusFileSource(discord.AudioSource):
+    """Plays an Ogg Opus file by passing its packets straight through, no ffmpeg or re-encode."""
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._packets = OggStream(self._file).iter_packets()
+
+    def read(self):
+        for packet in self._packets:
+            if not packet.startswith(_OPUS_HEADERS):
+                return packet
+        return b''
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        self._file.close()
+
+
+class OpusPacketSource(discord.AudioSource):
+    """Plays Opus packets already held in memory."""
+    def __init__(self, packets):
+        self._packets = iter(packets)
+
+    def read(self):
+        return next(self._packets, b'')
+
+    def is_opus(self):
+        return True
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def read_opus_packets(path):
+    """Reads every audio packet of an Ogg Opus file into a tuple."""
+    with open(path, 'rb') as f:
+        return tuple(p for p in OggStream(f).iter_packets() if not p.startswith(_OPUS_HEADERS))
+
+
+class OpusCache:
+    """
+    Sound files pre-encoded to 48 kHz Ogg Opus with the volume (and optional
+    loudness normalization) baked in, stored in cache_dir keyed by a hash of
+    the file content and the encode settings. Cached sounds play through
+    OpusFileSource; anything not encoded yet falls back to live ffmpeg.
+    Sounds are looked up by path in a map filled by warm() and encode(), so
+    playback never stats or hashes files on the event loop.
+    """
+    def __init__(self, cache_dir, volume=0.4, loudnorm=False, bitrate='96k', ffmpeg='ffmpeg'):
+        self.cache_dir = cache_dir
+        self.volume = volume
+        self.loudnorm = loudnorm
+        self.bitrate = bitrate
+        self.ffmpeg = ffmpeg
+        self._keys = {}
+        self._encoded = {}
+        self._encoding = {}
+        self._clips = {}
+        self._warm_task = None
+
+    @property
+    def audio_filter(self):
+        filters = ['loudnorm=I=-16:TP=-1.5:LRA=11'] if self.loudnorm else []
+        filters.append(f'volume={self.volume}')
+        return ','.join(filters)
+
+    def key(self, path):
+        """Content hash of a sound plus the encode settings; cached per (path, mtime, size)."""
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._keys.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{self.audio_filter}|{self.bitrate}".encode())
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+        key = h.hexdigest()
+        self._keys[path] = (stamp, key)
+        return key
+
+    def cached_path(self, path):
+        """Returns the encoded file for a sound, or None if it isn't encoded yet. Blocking."""
+        try:
+            encoded = os.path.join(self.cache_dir, f"{self.key(path)}.opus")
+        except OSError:
+            return None
+        return encoded if os.path.exists(encoded) else None
+
+    async def encode(self, path):
+        """Encodes one sound into the cache. Concurrent calls for the same file share one ffmpeg run."""
+        task = self._encoding.get(path)
+        if task is None:
+            task = asyncio.ensure_future(self._encode(path))
+            self._encoding[path] = task
+            task.add_done_callback(lambda _: self._encoding.pop(path, None))
+        return await asyncio.shield(task)
+
+    def _prepare(self, path):
+        """Returns (encoded file path, whether it already exists), creating cache_dir. Blocking."""
+        encoded = os.path.join(self.cache_dir, f"{self.key(path)}.opus")
+        if os.path.exists(encoded):
+            return encoded, True
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return encoded, False
+
+    def _prune(self, wanted):
+        """Removes cache files whose name isn't in `wanted`. Blocking."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.opus') and entry.name not in wanted:
+                os.remove(entry.path)
+
+    async def _encode(self, path):
+        # Every filesystem call goes through a worker thread
+        encoded, exists = await asyncio.to_thread(self._prepare, path)
+        if exists:
+            self._encoded[path] = encoded
+            return encoded
+        tmp_path = f"{encoded}.tmp"
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                self.ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', path,
+                '-filter:a', self.audio_filter, '-ar', '48000', '-ac', '2',
+                '-c:a', 'libopus', '-b:a', self.bitrate, '-f', 'ogg', tmp_path,
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as e:
+            print(f"WARNING: Could not run {self.ffmpeg}: {e}")
+            return None
+        _, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            await asyncio.to_thread(_remove_quietly, tmp_path)
+            print(f"WARNING: Could not encode {path}: {stderr.decode(errors='replace').strip()}")
+            return None
+        await asyncio.to_thread(os.replace, tmp_path, encoded)
+        self._encoded[path] = encoded
+        return encoded
+
+    async def warm(self, libraries, preload=()):
+        """
+        Encodes every sound of the given SoundLibrary objects, one at a time, then drops stale cache files.
+        Sounds of the libraries in `preload` are also kept in memory as Opus packets.
+        """
+        wanted, encoded = set(), 0
+        for library in (*libraries, *preload):
+            library.refresh()
+            for filename in library.files:
+                path = library.path(filename)
+                try:
+                    already = await asyncio.to_thread(self.cached_path, path)
+                    result = already or await self.encode(path)
+                except Exception as e:
+                    print(f"WARNING: Could not encode {path}: {e}")
+                    continue
+                if result:
+                    self._encoded[path] = result
+                    wanted.add(os.path.basename(result))
+                    encoded += already is None
+                    if library in preload and result not in self._clips:
+                        self._clips[result] = await asyncio.to_thread(read_opus_packets, result)
+        for path, result in list(self._encoded.items()):
+            if os.path.basename(result) not in wanted:
+                del self._encoded[path]
+        for result in list(self._clips):
+            if os.path.basename(result) not in wanted:
+                del self._clips[result]
+        await asyncio.to_thread(self._prune, wanted)
+        print(f"✅ Opus cache ready ({len(wanted)} sounds, {encoded} newly encoded, {len(self._clips)} in memory).")
+
+    def start_warm(self, *libraries, preload=()):
+        """Starts a background warm-up unless one is already running."""
+        if self._warm_task is None or self._warm_task.done():
+            self._warm_task = asyncio.ensure_future(self.warm(libraries, preload))
+        return self._warm_task
+
+    async def source(self, path):
+        """Returns an AudioSource for a sound: cached Opus passthrough, or live ffmpeg while it gets encoded."""
+        encoded = self._encoded.get(path)
+        if encoded in self._clips:
+            return OpusPacketSource(self._clips[encoded])
+        if encoded:
+            try:
+                return await asyncio.to_thread(OpusFileSource, encoded)
+            except OSError:
+                # Removed from the cache since it was mapped
+                self._encoded.pop(path, None)
+        if path not in self._encoding:
+            asyncio.ensure_future(self.encode(path))
+        return discord.FFmpegPCMAudio(path, options=f'-filter:a "{self.audio_filter}"')
+
+
+class VoiceQueue:
+    """
+    Per-guild playback queue. Queued sources play one after another once the
+    guild's voice connection is up and whatever is already playing has
+    finished, so nothing queued here cuts off another sound.
+    """
+    def __init__(self, max_pending=3, ready_timeout=5.0, busy_timeout=30.0):
+        self.max_pending = max_pending
+        self.ready_timeout = ready_timeout
+        self.busy_timeout = busy_timeout
+        self._queues = {}
+        self._workers = {}
+
+    def enqueue(self, guild, source, label):
+        """Queues a source for a guild. Returns False (and discards it) if the queue is full."""
+        queue = self._queues.setdefault(guild.id, collections.deque())
+        if len(queue) >= self.max_pending:
+            source.cleanup()
+            return False
+        queue.append((source, label))
+        worker = self._workers.get(guild.id)
+        if worker is None or worker.done():
+            self._workers[guild.id] = asyncio.ensure_future(self._drain(guild))
+        return True
+
+    async def _wait_ready(self, guild):
+        loop = asyncio.get_running_loop()
+        connect_deadline = loop.time() + self.ready_timeout
+        busy_deadline = loop.time() + self.busy_timeout
+        while True:
+            voice_client = guild.voice_client
+            connected = voice_client is not None and voice_client.is_connected()
+            if connected and not voice_client.is_playing():
+                return voice_client
+            if loop.time() > (busy_deadline if connected else connect_deadline):
+                return None
+            await asyncio.sleep(0.05)
+
+    async def _drain(self, guild):
+        loop = asyncio.get_running_loop()
+        queue = self._queues[guild.id]
+        while queue:
+            source, label = queue.popleft()
+            try:
+                voice_client = await self._wait_ready(guild)
+                if voice_client is None:
+                    source.cleanup()
+                    print(f"Skipped {label}: voice connection not ready.")
+                    continue
+                finished = asyncio.Event()
+                voice_client.play(source, after=lambda e: loop.call_soon_threadsafe(finished.set))
+                print(f"Played {label}")
+                await finished.wait()
+            except Exception as e:
+                source.cleanup()
+                print(f"Failed to play {label}: {e}")
@@ -1,54 +1,109 @@
+import aiohttp
 import discord
 from discord.ext import commands, tasks
-import aiohttp
-import json
-import os
 import asyncio
 import random
 import re
+from datetime import datetime, timedelta
 from typing import Optional
 import sys
 
 import config
 import opendota
+import match_store
+import poll_scheduler
+import heroes
+import assets
+import sounds
+import audio
+import corpus
+import startup
+import registry
+import members
+import delivery
 
 # --- Validate Configuration ---
 if not config.validate():
     sys.exit(1)
 
 # --- Load Data from Config ---
-user_map = config.load_users()
-MESSAGES = config.load_messages()
-ROASTS = config.load_roasts()
-SLANGS = config.load_slangs()
-
-# --- Global Bot State ---
-LAST_MATCH_CACHE = {}
-CHAT_HISTORY = {}
-DETAILED_LAST_MATCH_CACHE = {}
-last_seen_matches = {}
-HERO_NAMES = {}
-HERO_IMAGE_KEYS = {}
-HERO_LOOKUP = {}
-from datetime import datetime, timedelta
+# Discord id -> linked steam ids, shared with every module that needs it
+REGISTRY = registry.UserRegistry(config.DATABASE_FILE)
+REGISTRY.load()
+# Messages, roasts and slangs, compiled once and loaded on first use
+CORPUS = corpus.Corpus(config.CORPUS_CACHE_FILE)
 
 # --- Global Bot State ---
 LAST_MATCH_CACHE = {}
 CHAT_HISTORY = {}
 DETAILED_LAST_MATCH_CACHE = {}
-last_seen_matches = {}
-HERO_NAMES = {}
-HERO_IMAGE_KEYS = {}
-HERO_LOOKUP = {}
-HERO_ROLES = {}
+# What flush_poller_state last wrote to disk
+_saved_last_seen = config.load_poller_state()
+# Accounts unregistered while the bot was down are dropped from the file on the first flush
+last_seen_matches = {s_id: m_id for s_id, m_id in _saved_last_seen.items() if s_id in REGISTRY.tracked()}
 channel_message_counts = {}
 channel_last_help_post_time = {}
 
+# Shared hero catalog, usable straight away from the local snapshot
+HEROES = heroes.HeroCatalog(config.HERO_SNAPSHOT_FILE)
+HEROES.load_snapshot()
+assets.PORTRAITS.load()
+
+# Soundboard and voice-join greeting indexes, re-listed only when their folders change
+SOUNDS = sounds.SoundLibrary("sounds")
+GREETINGS = sounds.SoundLibrary("greetings")
+SOUNDS.refresh(force=True)
+GREETINGS.refresh(force=True)
+SOUND_CACHE = audio.OpusCache(config.SOUND_CACHE_DIR, volume=config.SOUND_VOLUME, loudnorm=config.SOUND_LOUDNORM)
+VOICE_QUEUE = audio.VoiceQueue()
+
+POLL_SCHEDULER = poll_scheduler.PollScheduler(
+    active_interval=config.POLL_ACTIVE_INTERVAL,
+    base_interval=config.POLL_BASE_INTERVAL,
+    max_interval=config.POLL_MAX_INTERVAL,
+    session_window=config.POLL_SESSION_WINDOW,
+    jitter=config.POLL_JITTER,
+)
+
+def on_registry_change(discord_id):
+    """Drops cached last-match data of a user whose accounts changed and reschedules polls."""
+    DETAILED_LAST_MATCH_CACHE.pop(discord_id, None)
+    LAST_MATCH_CACHE.pop(discord_id, None)
+    tracked = REGISTRY.tracked()
+    # An account registered again later gets a fresh baseline instead of an alert for an old match
+    for steam_id in [s_id for s_id in last_seen_matches if s_id not in tracked]:
+        del last_seen_matches[steam_id]
+    POLL_SCHEDULER.sync(tracked)
+
+REGISTRY.subscribe(on_registry_change)
+
+# Shared pooled HTTP client, reused by the poller and every command
+OPENDOTA = opendota.OpenDotaClient(
+    match_store=match_store.open_store(config.MATCH_STORE_FILE, config.MATCH_STORE_MAX_BYTES),
+    profile_ttl=config.PROFILE_TTL,
+    api_key=config.OPENDOTA_API_KEY,
+    per_minute=config.OPENDOTA_RATE_PER_MINUTE,
+    per_day=config.OPENDOTA_RATE_PER_DAY,
+    daily_reserve=config.OPENDOTA_DAILY_RESERVE,
+    max_retries=config.OPENDOTA_MAX_RETRIES,
+    max_wait=config.OPENDOTA_MAX_WAIT,
+)
+# Plain session for every other HTTP service (e.g. the Ollama host), kept apart from OpenDota's quota and pool
+_http_session = None
+
+def http_session():
+    """Returns the shared non-OpenDota HTTP session, creating it on first use inside the running loop."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession()
+    return _http_session
+
 # --- Bot Initialization ---
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+# Members are chunked on demand by members.MEMBERS, not before on_ready
+bot = commands.Bot(command_prefix='!', intents=intents, chunk_guilds_at_startup=False)
 bot.remove_command('help')
 
 
@@ -61,11 +116,14 @@ async def help_command(ctx):
         color=discord.Color.green()
     )
     embed.add_field(name="!help", value="Shows this message.", inline=False)
-    embed.add_field(name="!register <steam_id>", value="Registers your Steam ID.", inline=False)
+    embed.add_field(name="!register <steam_id>", value="Registers your Steam ID. Register again to link another account.", inline=False)
+    embed.add_field(name="!unregister [steam_id]", value="Unlinks one of your Steam IDs, or all of them.", inline=False)
     embed.add_field(name="!last [mention]", value="Shows the last match of the registered user.", inline=False)
     embed.add_field(name="!check", value="Forces a scan for new matches for all registered users.", inline=False)
     embed.add_field(name="!random [position]", value="Suggests a random hero to play.", inline=False)
     embed.add_field(name="!status [mention]", value="Shows detailed stats for the last match.", inline=False)
+    embed.add_field(name="!lobby [match_id]", value="Grades all ten players of your last match (or any match).", inline=False)
+    embed.add_field(name="!hero <name>", value="Looks up a hero, typos and partial names welcome.", inline=False)
     embed.add_field(name="!toxic [mention] [message]", value="Roasts the user using the toxic-dota model.", inline=False)
     embed.add_field(name="!vocal [sound_name]", value="Joins voice chat and plays a sound.", inline=False)
     embed.add_field(name="!sounds", value="Lists all available sound files.", inline=False)
@@ -77,19 +135,15 @@ async def help_command(ctx):
 @bot.command(name='sounds')
 async def list_sounds(ctx):
     """Lists all available sound files."""
-    sound_dir = "sounds"
-    if not os.path.exists(sound_dir):
+    if not SOUNDS.exists:
         await ctx.send("No sound directory found.")
         return
 
-    files = [f.replace(".mp3", "") for f in os.listdir(sound_dir) if f != ".gitkeep"]
-    if not files:
+    if not SOUNDS.files:
         await ctx.send("No sounds available.")
         return
 
-    files.sort()
-    sound_list = "\n".join(files)
-    
+    sound_list = SOUNDS.listing
     if len(sound_list) > 4000:
         sound_list = sound_list[:3997] + "..."
 
@@ -107,17 +161,58 @@ async def send_reminder():
     channel = bot.get_channel(config.CHANNEL_ID)
     if not channel:
         return
-    await channel.send("Sometimes valve fucks up some shit service and OpenDota doesn't get the fucking game stats, chill, will come later. So wait for OpenDota to update, when a new match is there, i will see it and post it. Stop blaming me for this shit. Also if i restart i lose memory of last match so even though you just finished a game i will not treat it as a new game(you can still see it using !last) use !help for help...trash dog")
+    await channel.send("Sometimes valve fucks up some shit service and OpenDota doesn't get the fucking game stats, chill, will come later. So wait for OpenDota to update, when a new match is there, i will see it and post it. Stop blaming me for this shit. If i restart i still remember your last match, so games you finish while i'm down get posted when i'm back. Use !help for help...trash dog")
+
+@tasks.loop(seconds=config.CORPUS_WATCH_SECONDS)
+async def watch_corpus():
+    """Hot-reloads messages.json, roasts.json and slangs.json when they are edited."""
+    await CORPUS.reload()
+
+# --- Startup ---
+# Independent stages run concurrently; each command only waits for the stages it needs
+STARTUP = startup.Startup()
+COMMAND_STAGES = {
+    'check': ('heroes', 'corpus'),
+    'last': ('heroes', 'corpus'),
+    'status': ('heroes', 'corpus'),
+    'random': ('heroes', 'corpus'),
+    'lobby': ('heroes',),
+    'hero': ('heroes',),
+}
+
+@STARTUP.stage('corpus')
+async def load_corpus():
+    try:
+        await asyncio.to_thread(CORPUS.build)
+    finally:
+        # Hot reload also recovers from sources that were invalid at boot
+        watch_corpus.start()
+
+@STARTUP.stage('heroes')
+async def load_heroes():
+    # With a snapshot loaded, the download only refreshes it in the background.
+    # Without one, startup waits for the first attempt; failures keep being retried.
+    refresh = HEROES.start_refresh(
+        OPENDOTA,
+        interval=config.HERO_REFRESH_INTERVAL,
+        retry_base=config.HERO_RETRY_BASE,
+        retry_max=config.HERO_RETRY_MAX,
+    )
+    if not HEROES.names:
+        await refresh
 
-@bot.event
-async def on_ready():
-    """Called when the bot is ready and connected."""
-    print(f'✅ Bot is online with Tips and AI Roasts.')
-    await opendota.update_hero_data(HERO_NAMES, HERO_IMAGE_KEYS, HERO_LOOKUP, HERO_ROLES)
+@STARTUP.stage('poller', after=('heroes', 'corpus'))
+async def start_poller():
     check_for_new_matches.start()
     send_reminder.start()
 
-    # Join specific voice channel
+@STARTUP.stage('sounds')
+async def warm_sounds():
+    await SOUND_CACHE.start_warm(SOUNDS, preload=(GREETINGS,))
+
+@STARTUP.stage('voice')
+async def join_voice_channel():
+    """Joins the hangout voice channel unless already connected."""
     try:
         voice_channel = bot.get_channel(1457514629281616058)
         if voice_channel:
@@ -133,6 +228,22 @@ async def on_ready():
     except Exception as e:
         print(f"Failed to join voice channel on ready: {e}")
 
+@bot.before_invoke
+async def wait_for_startup(ctx):
+    """Holds a command until the startup stages it depends on are done."""
+    stages = COMMAND_STAGES.get(ctx.command.qualified_name)
+    if stages:
+        await STARTUP.wait(stages, timeout=config.STARTUP_COMMAND_TIMEOUT)
+
+@bot.event
+async def on_ready():
+    """Called when the bot is ready and connected. Fires again after every reconnect."""
+    if STARTUP.run():
+        print(f'✅ Bot is online with Tips and AI Roasts.')
+    else:
+        print("🔄 Reconnected to Discord.")
+        await join_voice_channel()
+
 @bot.event
 async def on_message(message):
     """Called when a message is sent in a channel the bot can see."""
@@ -164,96 +275,214 @@ async def on_message(message):
     await bot.process_commands(message)
 
 
-@tasks.loop(seconds=300)
+async def poll_user(discord_id, steam_id, guild):
+    """
+    Checks a single registered user for a new match.
+    Returns a MatchSnapshot for a new match, else None.
+    """
+    last_id = last_seen_matches.get(steam_id)
+    if not last_id:
+        # No baseline for this player yet: record their latest match without downloading its details
+        latest_id = await opendota.get_latest_match_id(OPENDOTA, steam_id)
+        if steam_id in REGISTRY.tracked():
+            last_seen_matches[steam_id] = latest_id
+        return None
+
+    # Pass the last seen match ID to avoid unnecessary API calls
+    snapshot = await opendota.fetch_match_snapshot(
+        OPENDOTA, steam_id, discord_id, LAST_MATCH_CACHE,
+        HEROES.names, HEROES.roles, CORPUS.messages, last_known_match_id=last_id
+    )
+    if snapshot is None or steam_id not in REGISTRY.tracked():
+        # Nothing new, or the account was unregistered while the request was in flight
+        return None
+
+    # A match we haven't seen (including ones finished while the bot was down)
+    last_seen_matches[steam_id] = snapshot.match_id
+    DETAILED_LAST_MATCH_CACHE[discord_id] = (snapshot.player_match_data, snapshot.analysis)
+    return snapshot
+
+async def flush_poller_state():
+    """Persists last_seen_matches if it changed since the last flush."""
+    global _saved_last_seen
+    if last_seen_matches == _saved_last_seen:
+        return
+    snapshot = dict(last_seen_matches)
+    try:
+        await asyncio.to_thread(config.save_json_atomic, config.POLLER_STATE_FILE, snapshot)
+        _saved_last_seen = snapshot
+    except Exception as e:
+        print(f"Error writing {config.POLLER_STATE_FILE}: {e}")
+
+async def post_new_matches(channel, guild, alerts):
+    """Posts poller alerts, folding players who shared a match into one party report."""
+    by_match = {}
+    for snapshot in alerts:
+        by_match.setdefault(str(snapshot.match_id), []).append(snapshot)
+
+    items = []
+    for group in by_match.values():
+        if config.PARTY_REPORTS and len(group) > 1:
+            party = []
+            for snapshot in group:
+                mention_text = opendota.resolve_mention(guild, snapshot.discord_id, config.MEMBER_NAMES)
+                party.append((mention_text, snapshot.player_match_data, snapshot.analysis))
+            items.append(delivery.Outgoing(embed=opendota.create_party_embed(party, HEROES.names)))
+            continue
+        for snapshot in group:
+            embed, image_file = await snapshot.to_alert_embed(
+                guild, HEROES.names, HEROES.image_keys, config.RANK_NAMES, config.MEMBER_NAMES, CORPUS.messages
+            )
+            items.append(delivery.Outgoing(embed=embed, file=image_file))
+    if items:
+        # Packed into as few messages as Discord allows
+        try:
+            await delivery.DELIVERY.deliver(channel, items)
+        except Exception as e:
+            print(f"Failed to post new matches: {e}")
+
+async def find_tracked_teammates(alerts, tracked, already_polled):
+    """Returns tracked steam ids that appear in the new matches but weren't polled this tick."""
+    teammates = set()
+    for alert in alerts:
+        try:
+            status, d_data = await OPENDOTA.get_match(alert.match_id)
+        except Exception as e:
+            print(f"Could not look up players of match {alert.match_id}: {e}")
+            continue
+        if status != 200 or not d_data:
+            continue
+        for p in d_data.get('players', []):
+            steam_id = str(p.get('account_id'))
+            if steam_id in tracked and steam_id not in already_polled:
+                teammates.add(steam_id)
+    return teammates
+
+@tasks.loop(seconds=config.POLL_TICK_SECONDS)
 async def check_for_new_matches():
-    """Periodically checks for new matches for all registered users."""
+    """Polls the registered users whose next scheduled check is due."""
     channel = bot.get_channel(config.CHANNEL_ID)
     if not channel: 
         return
     
+    # Every OpenDota request made by the poller queues behind user commands
+    opendota.BACKGROUND.set(True)
+    tracked = REGISTRY.tracked()
+    POLL_SCHEDULER.sync(tracked)
+    due = POLL_SCHEDULER.due()
+    if not due:
+        return
+
     guild = channel.guild
-    
-    async with aiohttp.ClientSession() as session:
-        for discord_id, steam_id in user_map.items():
-            try:
-                # Pass the last seen match ID to avoid unnecessary API calls
-                last_id = last_seen_matches.get(steam_id)
-                embed, image_file, m_id, player_match_data, analysis, _, _ = await opendota.create_match_embed(
-                    session, steam_id, discord_id, guild, LAST_MATCH_CACHE,
-                    HERO_NAMES, HERO_IMAGE_KEYS, HERO_ROLES, config.RANK_NAMES, 
-                    config.MEMBER_NAMES, MESSAGES, last_known_match_id=last_id
-                )
-                
-                # Update the cache with the latest match ID, even if we skipped details
-                if m_id:
-                     last_seen_matches[steam_id] = m_id
-
-                if embed and m_id:
-                    # If embed is returned, it means it's a new match (or first run)
-                    DETAILED_LAST_MATCH_CACHE[discord_id] = (player_match_data, analysis)
-                    # Only send if it wasn't the very first check to avoid spamming on restart 
-                    # (Unless we want to see the last match on restart? logic below handles "new match" check)
-                    # Actually, create_match_embed only returns embed if last_known_match_id didn't match.
-                    # But if last_known_match_id was None (first run), it returns embed.
-                    # We might want to suppress printing on the very first run unless we want it.
-                    # The original logic had: if embed and m_id and last_seen_matches.get(steam_id) != m_id:
-                    # But we just updated last_seen_matches above.
-                    # Let's check against `last_id` (the value BEFORE the call).
-                    
-                    if last_id and str(m_id) != str(last_id):
-                         await channel.send(embed=embed, file=image_file)
-                    elif not last_id:
-                         # First run ever for this session. Just cache it, don't spam.
-                         pass
+    semaphore = asyncio.Semaphore(config.POLL_CONCURRENCY)
+    # Cleared while the whole fan-out is backing off from a rate limit
+    resume = asyncio.Event()
+    resume.set()
+
+    deferred = []
+
+    async def worker(steam_id, deferrable=True):
+        discord_id = tracked[steam_id]
+        async with semaphore:
+            # Idle players can wait while commands are using the quota; players mid-session can't
+            if deferrable and OPENDOTA.should_yield() and not POLL_SCHEDULER.in_session(steam_id):
+                POLL_SCHEDULER.defer(steam_id, config.POLL_DEFER_SECONDS)
+                deferred.append(steam_id)
+                return None
+            for _ in range(config.POLL_RATE_LIMIT_RETRIES + 1):
+                await resume.wait()
+                try:
+                    alert = await asyncio.wait_for(poll_user(discord_id, steam_id, guild), timeout=config.POLL_USER_TIMEOUT)
+                    POLL_SCHEDULER.record(steam_id, new_match=alert is not None)
+                    return alert
+                except opendota.RateLimitException:
+                    # The poller's requests are background ones, so they also wait out the reserve
+                    wait = OPENDOTA.limiter.wait_time(background=True)
+                    if wait > config.OPENDOTA_MAX_WAIT:
+                        print(f"Background quota for user {steam_id} frees up in {wait:.0f}s ({OPENDOTA.budget()}). Will try again later.")
+                        break
+                    if resume.is_set():
+                        # Wait as long as the client says the quota needs, up to the configured pause
+                        pause = min(config.POLL_RATE_LIMIT_PAUSE, max(1.0, wait))
+                        print(f"Rate limit reached during background check ({OPENDOTA.budget()}). Pausing all polls for {pause:.0f}s.")
+                        resume.clear()
+                        await asyncio.sleep(pause)
+                        resume.set()
+                except opendota.NoMatchesException as e:
+                    print(f"Skipping user {steam_id} in background check: {e}")
+                    POLL_SCHEDULER.record(steam_id)
+                    return None
+                except opendota.PlayerDataException as e:
+                    print(f"Skipping user {steam_id} in background check: {e}")
+                    break
+                except asyncio.TimeoutError:
+                    print(f"Timed out checking user {steam_id} in background check.")
+                    break
+                except Exception as e:
+                    print(f"Error in check_for_new_matches loop for {steam_id}: {e}")
+                    break
+            else:
+                print(f"Still rate limited for user {steam_id}. Will try again later.")
+        POLL_SCHEDULER.record(steam_id, failed=True)
+        return None
 
-            except opendota.RateLimitException:
-                print("Rate limit reached during background check. Will try again later.")
-                break 
-            except (opendota.NoMatchesException, opendota.PlayerDataException) as e:
-                print(f"Skipping user {steam_id} in background check: {e}")
-                continue
-            except Exception as e:
-                print(f"Error in check_for_new_matches loop for {steam_id}: {e}")
-                continue
+    alerts = [a for a in await asyncio.gather(*(worker(s_id) for s_id in due)) if a]
+    if deferred:
+        print(f"Deferred {len(deferred)} idle player checks while commands use the OpenDota quota ({OPENDOTA.budget()}).")
+
+    if config.PARTY_REPORTS:
+        # Tracked players who shared a new match are polled right away so their alerts land together
+        teammates = await find_tracked_teammates(alerts, tracked, set(due))
+        if teammates:
+            alerts += [a for a in await asyncio.gather(*(worker(s_id, deferrable=False) for s_id in teammates)) if a]
+
+    await post_new_matches(channel, guild, alerts)
+    await flush_poller_state()
 
 # --- COMMANDS ---
 
 @bot.command(name="check")
 async def force_check(ctx):
     """Forces an immediate scan and posts the latest match for everyone."""
-    await ctx.send("🔍 Checking for the latest matches for all players...")
-    await ctx.send("I see so much feeding happening...")
-    
-    async with aiohttp.ClientSession() as session:
-        for discord_id, steam_id in user_map.items():
-            friendly_name = config.MEMBER_NAMES.get(str(discord_id), steam_id)
-            try:
-                embed, image_file, m_id, player_match_data, analysis, _, _ = await opendota.create_match_embed(
-                    session, steam_id, discord_id, ctx.guild, LAST_MATCH_CACHE,
-                    HERO_NAMES, HERO_IMAGE_KEYS, HERO_ROLES, config.RANK_NAMES, 
-                    config.MEMBER_NAMES, MESSAGES
-                )
-                if embed:
-                    DETAILED_LAST_MATCH_CACHE[discord_id] = (player_match_data, analysis)
-                    await ctx.send(embed=embed, file=image_file)
-            except opendota.RateLimitException:
-                await ctx.send("🐌 OpenDota API rate limit reached. Go next.")
-                break 
-            except opendota.NoMatchesException:
-                await ctx.send(f"No recent matches found for **{friendly_name}**, probably banned for to much feed.")
-            except opendota.PlayerDataException as e:
-                await ctx.send(f"Could not retrieve match data for **{friendly_name}**: {e}. Most likely feeding.")
-            except Exception as e:
-                await ctx.send(f"An unexpected error occurred for **{friendly_name}**. Probably feeding.")
-                print(f"Error in !check for {steam_id}: {e}")
-
-    await ctx.send("✅ Check complete.")
+    await ctx.send("🔍 Checking for the latest matches for all players...\nI see so much feeding happening...")
+
+    # Every result goes out together at the end, packed into as few messages as possible
+    items, problems = [], []
+    for discord_id, steam_id in REGISTRY.users():
+        friendly_name = config.MEMBER_NAMES.get(str(discord_id), steam_id)
+        try:
+            snapshot = await opendota.fetch_match_snapshot(
+                OPENDOTA, steam_id, discord_id, LAST_MATCH_CACHE,
+                HEROES.names, HEROES.roles, CORPUS.messages
+            )
+            DETAILED_LAST_MATCH_CACHE[discord_id] = (snapshot.player_match_data, snapshot.analysis)
+            embed, image_file = await snapshot.to_alert_embed(
+                ctx.guild, HEROES.names, HEROES.image_keys, config.RANK_NAMES, config.MEMBER_NAMES, CORPUS.messages
+            )
+            items.append(delivery.Outgoing(embed=embed, file=image_file))
+        except opendota.RateLimitException:
+            problems.append("🐌 OpenDota API rate limit reached. Go next.")
+            break 
+        except opendota.NoMatchesException:
+            problems.append(f"No recent matches found for **{friendly_name}**, probably banned for to much feed.")
+        except opendota.PlayerDataException as e:
+            problems.append(f"Could not retrieve match data for **{friendly_name}**: {e}. Most likely feeding.")
+        except Exception as e:
+            problems.append(f"An unexpected error occurred for **{friendly_name}**. Probably feeding.")
+            print(f"Error in !check for {steam_id}: {e}")
+
+    problems.append("✅ Check complete.")
+    items += [delivery.Outgoing(text=line) for line in problems]
+    try:
+        await delivery.DELIVERY.deliver(ctx.channel, items)
+    except Exception as e:
+        print(f"Error delivering !check results: {e}")
 
 @bot.command()
 async def last(ctx, member: discord.Member = None):
     """Show the most recent match and current rank for a registered user."""
     target = member if member else ctx.author
-    steam_id = user_map.get(str(target.id))
+    steam_id = REGISTRY.get(str(target.id))
     
     if not steam_id:
         await ctx.send("❌ Not registered. Use `!register <steam_id>` to register.")
@@ -261,51 +490,68 @@ async def last(ctx, member: discord.Member = None):
 
     await ctx.send(f"🔍 Looking up the last match for {target.display_name}...")
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            embed, image_file, _, player_match_data, analysis, _, _ = await opendota.create_match_embed(
-                session, steam_id, str(target.id), ctx.guild, LAST_MATCH_CACHE,
-                HERO_NAMES, HERO_IMAGE_KEYS, HERO_ROLES, config.RANK_NAMES, 
-                config.MEMBER_NAMES, MESSAGES
-            )
-            if embed:
-                DETAILED_LAST_MATCH_CACHE[str(target.id)] = (player_match_data, analysis)
-                await ctx.send(embed=embed, file=image_file)
-        except opendota.RateLimitException:
-            await ctx.send("Even i have a limit. Go next, try again later. When you come back from feeding.")
-        except opendota.NoMatchesException:
-            await ctx.send(f"No recent matches found for **{target.display_name}**. But even if they were found, they probably fed.")
-        except opendota.PlayerDataException as e:
-            await ctx.send(f"Could not retrieve match data for **{target.display_name}**: {e} or probably feeding.")
-        except Exception as e:
-            await ctx.send(f"An unexpected error occurred: {e} UNEXPECTED FEEDING.")
-            print(f"Exception in !last: {repr(e)}")
+    try:
+        snapshot = await opendota.fetch_match_snapshot(
+            OPENDOTA, steam_id, str(target.id), LAST_MATCH_CACHE,
+            HEROES.names, HEROES.roles, CORPUS.messages
+        )
+        DETAILED_LAST_MATCH_CACHE[str(target.id)] = (snapshot.player_match_data, snapshot.analysis)
+        embed, image_file = await snapshot.to_alert_embed(
+            ctx.guild, HEROES.names, HEROES.image_keys, config.RANK_NAMES, config.MEMBER_NAMES, CORPUS.messages
+        )
+        await ctx.send(embed=embed, file=image_file)
+    except opendota.RateLimitException:
+        await ctx.send("Even i have a limit. Go next, try again later. When you come back from feeding.")
+    except opendota.NoMatchesException:
+        await ctx.send(f"No recent matches found for **{target.display_name}**. But even if they were found, they probably fed.")
+    except opendota.PlayerDataException as e:
+        await ctx.send(f"Could not retrieve match data for **{target.display_name}**: {e} or probably feeding.")
+    except Exception as e:
+        await ctx.send(f"An unexpected error occurred: {e} UNEXPECTED FEEDING.")
+        print(f"Exception in !last: {repr(e)}")
 
 @bot.command()
 async def register(ctx, steam_id: str):
-    """Register your Steam/OpenDota numeric id for automatic tracking."""
-    user_map[str(ctx.author.id)] = steam_id
+    """Register your Steam/OpenDota numeric id for automatic tracking. Register again to link another account."""
     try:
-        with open(config.DATABASE_FILE, 'w') as f:
-            json.dump(user_map, f, indent=2)
-        await ctx.send(f"✅ Registered Feeder <@{ctx.author.id}> -> `{steam_id}`")
+        await REGISTRY.register(ctx.author.id, steam_id)
+    except ValueError as e:
+        await ctx.send(f"❌ Can't link `{steam_id}`, {e}. Use `!unregister <steam_id>` to drop one, smurf lord.")
+        return
     except Exception as e:
         await ctx.send("Failed to write database.")
         print("Error writing users.json:", e)
+        return
+    linked = len(REGISTRY.accounts(ctx.author.id))
+    extra = f" ({linked} accounts linked, this one is now your main)" if linked > 1 else ""
+    await ctx.send(f"✅ Registered Feeder <@{ctx.author.id}> -> `{steam_id}`{extra}")
 
+@bot.command()
+async def unregister(ctx, steam_id: Optional[str] = None):
+    """Unlinks one of your steam ids, or all of them."""
+    try:
+        removed = await REGISTRY.unregister(ctx.author.id, steam_id)
+    except Exception as e:
+        await ctx.send("Failed to write database.")
+        print("Error writing users.json:", e)
+        return
+    if not removed:
+        await ctx.send("❌ Nothing to unregister. You can't escape what you never joined.")
+        return
+    await ctx.send(f"✅ Unlinked `{steam_id}`." if steam_id else "✅ Unlinked all your accounts. Coward.")
 
-ROASTS = config.load_roasts()
-SLANGS = config.load_slangs()
 
-def generate_roast(hero_name, player_match_data, analysis):
+def generate_roast(hero_id, hero_name, player_match_data, analysis):
     """Generates a personalized roast based on the player's last match."""
-    hero_roasts = ROASTS.get("hero_roasts", {})
-    performance_roasts = ROASTS.get("performance_roasts", {})
-    generic_roasts = ROASTS.get("generic_roasts", [])
+    performance_roasts = CORPUS.performance_roasts
+    generic_roasts = CORPUS.generic_roasts
+    if not generic_roasts:
+        return ""
 
     # Try to find a hero-specific roast
-    if hero_name.lower() in hero_roasts:
-        return random.choice(hero_roasts[hero_name.lower()])
+    hero_roasts = CORPUS.hero_roasts(HEROES, hero_id)
+    if hero_roasts:
+        return random.choice(hero_roasts)
 
     # Try to find a performance-based roast
     if player_match_data and analysis:
@@ -314,44 +560,39 @@ def generate_roast(hero_name, player_match_data, analysis):
         gpm = player_match_data.get('gold_per_min', 0)
 
         if deaths > kills and deaths > 8:
-            return random.choice(performance_roasts.get("feeder", generic_roasts))
+            return corpus.render(random.choice(performance_roasts.get("feeder") or generic_roasts), hero_name=f"**{hero_name}**")
         if gpm < 300:
-            return random.choice(performance_roasts.get("low_gpm", generic_roasts))
+            return corpus.render(random.choice(performance_roasts.get("low_gpm") or generic_roasts), hero_name=f"**{hero_name}**")
 
     # Fallback to a generic roast
-    return random.choice(generic_roasts).format(hero_name=f"**{hero_name}**")
+    return corpus.render(random.choice(generic_roasts), hero_name=f"**{hero_name}**")
 
 @bot.command(name='random')
 async def random_command(ctx, position: Optional[str] = None):
     """Suggests a random hero to play, with an optional position filter."""
-    steam_id = user_map.get(str(ctx.author.id))
+    steam_id = REGISTRY.get(str(ctx.author.id))
     if not steam_id:
         await ctx.send("❌ Not registered. Use `!register <steam_id>` to register.")
         return
 
     # Determine hero pool first
-    hero_pool = list(HERO_NAMES.keys())
     if position:
         position = position.lower()
-        role_map = {
-            "carry": ["Carry"], "mid": ["Nuker", "Disabler", "Escape"],
-            "offlane": ["Durable", "Initiator", "Disabler"], "support": ["Support"]
-        }
-        target_roles = role_map.get(position)
-        if target_roles:
-            filtered_pool = [hid for hid, roles in HERO_ROLES.items() if any(r in roles for r in target_roles)]
-            if filtered_pool:
-                hero_pool = filtered_pool
-            else:
-                await ctx.send(f"Couldn't find any heroes for position '{position}'. Just pick whatever and lose.")
-                return
-        else:
-            await ctx.send("dumb motherfucker, use !random [position] dota 2 position not some wierd kink you might have.")
-            return
+    hero_pool = HEROES.pool(position)
+    if hero_pool is None:
+        await ctx.send("dumb motherfucker, use !random [position] dota 2 position not some wierd kink you might have.")
+        return
+    if not HEROES.names:
+        # No snapshot and no download yet; the catalog keeps retrying in the background
+        await ctx.send("Hero list isn't loaded yet, OpenDota is taking a nap. Try again in a bit.")
+        return
+    if not hero_pool:
+        await ctx.send(f"Couldn't find any heroes for position '{position}'. Just pick whatever and lose.")
+        return
 
     chosen_id = random.choice(hero_pool)
-    h_name = HERO_NAMES.get(chosen_id, "Unknown Hero")
-    h_key = HERO_IMAGE_KEYS.get(chosen_id, "")
+    h_name = HEROES.names.get(chosen_id, "Unknown Hero")
+    h_key = HEROES.image_keys.get(chosen_id, "")
 
     description = f"I suggest you play **{h_name}**."
     
@@ -361,13 +602,13 @@ async def random_command(ctx, position: Optional[str] = None):
         if str(ctx.author.id) in DETAILED_LAST_MATCH_CACHE:
             player_match_data, analysis = DETAILED_LAST_MATCH_CACHE[str(ctx.author.id)]
         else:
-            async with aiohttp.ClientSession() as session:
-                embed, image_file, m_id, player_match_data, analysis, _, _ = await opendota.create_match_embed(
-                    session, steam_id, str(ctx.author.id), ctx.guild, LAST_MATCH_CACHE,
-                    HERO_NAMES, HERO_IMAGE_KEYS, HERO_ROLES, config.RANK_NAMES,
-                    config.MEMBER_NAMES, MESSAGES
-                )
-                DETAILED_LAST_MATCH_CACHE[str(ctx.author.id)] = (player_match_data, analysis)
+            # Only the data is needed here, nothing gets rendered
+            snapshot = await opendota.fetch_match_snapshot(
+                OPENDOTA, steam_id, str(ctx.author.id), LAST_MATCH_CACHE,
+                HEROES.names, HEROES.roles, CORPUS.messages
+            )
+            player_match_data, analysis = snapshot.player_match_data, snapshot.analysis
+            DETAILED_LAST_MATCH_CACHE[str(ctx.author.id)] = (player_match_data, analysis)
         
         # Personalized message
         kills = player_match_data.get('kills', 0)
@@ -384,7 +625,7 @@ async def random_command(ctx, position: Optional[str] = None):
 
         role_transition_comment = ""
         if position and last_role != "Unknown" and position.capitalize() not in last_role:
-            role_transition_comment = random.choice(ROASTS["role_transition_comments"]).format(last_role=last_role, position=position)
+            role_transition_comment = CORPUS.role_transition(last_role, position)
         
         description += f"\n\n{performance_comment}\n{role_transition_comment}"
 
@@ -395,27 +636,41 @@ async def random_command(ctx, position: Optional[str] = None):
         description += "\n\nI couldn't fetch your last match data, probably because you're a coward."
 
     # Add a random roast
-    roast = generate_roast(h_name, player_match_data, analysis)
+    roast = generate_roast(chosen_id, h_name, player_match_data, analysis)
     description += f"\n\n{roast}"
 
     # Embed
     embed = discord.Embed(title="🎲 Your Random Hero", color=0x00ff00)
     embed.description = description
 
-    image_file = None
-    if h_key:
-        image_path = f"images/{h_key}.png"
-        if os.path.exists(image_path):
-            image_file = discord.File(image_path, filename=f"{h_key}.png")
-            embed.set_thumbnail(url=f"attachment://{h_key}.png")
+    image_file = assets.PORTRAITS.thumbnail(embed, h_key)
+    await ctx.send(embed=embed, file=image_file)
+
+@bot.command()
+async def hero(ctx, *, name: str = ""):
+    """Looks up a hero by (partial or misspelled) name."""
+    hero_id = HEROES.find(name)
+    if hero_id is None:
+        await ctx.send(f"Never heard of '{name}'. Make up your own heroes on your own time.")
+        return
 
+    h_name = HEROES.names.get(hero_id, "Unknown Hero")
+    h_key = HEROES.image_keys.get(hero_id, "")
+    positions = [p for p in heroes.POSITION_ROLES if hero_id in HEROES.pool(p)]
+
+    embed = discord.Embed(title=f"🦸 {h_name}", color=discord.Color.purple())
+    embed.add_field(name="Roles", value=", ".join(HEROES.roles.get(hero_id, [])) or "None", inline=False)
+    embed.add_field(name="!random positions", value=", ".join(positions) or "None", inline=False)
+    embed.add_field(name="Hero Details", value=f"[OpenDota](https://www.opendota.com/heroes/{hero_id})", inline=False)
+
+    image_file = assets.PORTRAITS.thumbnail(embed, h_key)
     await ctx.send(embed=embed, file=image_file)
 
 @bot.command()
 async def status(ctx, member: discord.Member = None):
     """Shows detailed stats for the last match."""
     target = member if member else ctx.author
-    steam_id = user_map.get(str(target.id))
+    steam_id = REGISTRY.get(str(target.id))
 
     if not steam_id:
         await ctx.send("❌ Not registered. Use `!register <steam_id>` to register.")
@@ -423,146 +678,77 @@ async def status(ctx, member: discord.Member = None):
 
     await ctx.send(f"🔍 Looking up the last match for {target.display_name}...")
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            _, image_file, _, player_match_data, analysis, team_stats, enemy_team_stats = await opendota.create_match_embed(
-                session, steam_id, str(target.id), ctx.guild, LAST_MATCH_CACHE,
-                HERO_NAMES, HERO_IMAGE_KEYS, HERO_ROLES, config.RANK_NAMES,
-                config.MEMBER_NAMES, MESSAGES
-            )
+    try:
+        snapshot = await opendota.fetch_match_snapshot(
+            OPENDOTA, steam_id, str(target.id), LAST_MATCH_CACHE,
+            HEROES.names, HEROES.roles, CORPUS.messages
+        )
+        DETAILED_LAST_MATCH_CACHE[str(target.id)] = (snapshot.player_match_data, snapshot.analysis)
+        embed, image_file = snapshot.to_status_embed(target.display_name, HEROES.names, HEROES.image_keys)
+        await ctx.send(embed=embed, file=image_file)
 
-            hero_id = player_match_data.get('hero_id')
-            h_name = HERO_NAMES.get(hero_id, "Unknown Hero")
-            h_key = HERO_IMAGE_KEYS.get(hero_id, "")
-            won = (player_match_data.get('player_slot', 0) < 128) == player_match_data.get('radiant_win', False)
-            
-            embed = discord.Embed(
-                title=f"📊 Match Status for {target.display_name} as {h_name}",
-                color=discord.Color.blue()
-            )
+    except opendota.NoMatchesException:
+        await ctx.send(f"No recent matches found for **{target.display_name}**.")
+    except Exception as e:
+        await ctx.send(f"An unexpected error occurred: {e}")
+        print(f"Exception in !status: {repr(e)}")
 
-            # Re-create image file for this embed since we can't reuse the one from create_match_embed easily 
-            # if we are discarding the original embed (which might have closed the file handle or we want to be safe)
-            # Actually, create_match_embed returns a fresh file object we haven't used yet, so we can use it.
-            # But we need to set the thumbnail url to attachment://...
-            
-            if h_key:
-                image_path = f"images/{h_key}.png"
-                if os.path.exists(image_path):
-                     # If create_match_embed returned a file, we can use it, but we need to match the filename
-                     # Let's just trust create_match_embed returned a valid file or None
-                     if image_file:
-                         embed.set_thumbnail(url=f"attachment://{image_file.filename}")
-                else:
-                    embed.set_thumbnail(url=f"https://api.opendota.com/apps/dota2/images/dota_react/heroes/{h_key}.png")
-
-            kda = f"{player_match_data.get('kills', 0)}/{player_match_data.get('deaths', 0)}/{player_match_data.get('assists', 0)}"
-            gpm = player_match_data.get('gold_per_min', 0)
-            xpm = player_match_data.get('xp_per_min', 0)
-            lh = player_match_data.get('last_hits', 0)
-            hd = player_match_data.get('hero_damage', 0)
-            td = player_match_data.get('tower_damage', 0)
-
-            embed.add_field(name="Result", value="🏆 WON" if won else "💀 LOST", inline=True)
-            embed.add_field(name="KDA", value=f"`{kda}`", inline=True)
-            embed.add_field(name="Approximated Role", value=analysis.get('approximated_role', 'N/A'), inline=True)
-
-            # Comparative Analysis
-            if team_stats and enemy_team_stats and team_stats.get('players') and enemy_team_stats.get('players'):
-                all_players = team_stats['players'] + enemy_team_stats['players']
-                
-                def get_rank_and_top(key, reverse=True):
-                    # Sort players by the key (descending for most stats)
-                    sorted_players = sorted(all_players, key=lambda x: x.get(key, 0), reverse=reverse)
-                    
-                    # Find user's rank
-                    rank = -1
-                    user_val = player_match_data.get(key, 0)
-                    for i, p in enumerate(sorted_players):
-                        if p.get('player_slot') == player_match_data.get('player_slot'):
-                            rank = i + 1
-                            break
-                    
-                    # Find top player details
-                    top_player = sorted_players[0]
-                    top_val = top_player.get(key, 0)
-                    top_hero_id = top_player.get('hero_id')
-                    top_hero_name = HERO_NAMES.get(top_hero_id, "Unknown")
-                    
-                    return rank, top_val, top_hero_name
-
-                # Calculate Ranks
-                gpm_rank, top_gpm, top_gpm_hero = get_rank_and_top('gold_per_min')
-                xpm_rank, top_xpm, top_xpm_hero = get_rank_and_top('xp_per_min')
-                hd_rank, top_hd, top_hd_hero = get_rank_and_top('hero_damage')
-                td_rank, top_td, top_td_hero = get_rank_and_top('tower_damage')
-                lh_rank, top_lh, top_lh_hero = get_rank_and_top('last_hits')
-                assists_rank, top_assists, top_assists_hero = get_rank_and_top('assists')
-                # For deaths, lower is better, so reverse=False
-                deaths_rank, top_deaths, top_deaths_hero = get_rank_and_top('deaths', reverse=False)
-                
-                # Calculate Grade based on Role
-                role = analysis.get('approximated_role', 'Unknown')
-                
-                if role in ["Carry", "Midlaner"]:
-                    ranks_to_avg = [gpm_rank, xpm_rank, hd_rank, td_rank, lh_rank]
-                elif role == "Offlaner":
-                    # Offlaners care about impact (HD, TD, Assists) and farm (XPM, GPM)
-                    ranks_to_avg = [xpm_rank, hd_rank, td_rank, gpm_rank, assists_rank]
-                elif role == "Support":
-                    # Supports care about Assists, Survival (Deaths), Impact (HD), and Level (XPM)
-                    # We ignore GPM/LH/TD as they are not primary support jobs
-                    ranks_to_avg = [assists_rank, deaths_rank, hd_rank, xpm_rank]
-                else:
-                    # Default / Unknown
-                    ranks_to_avg = [gpm_rank, xpm_rank, hd_rank, td_rank, lh_rank]
-
-                avg_rank = sum(ranks_to_avg) / len(ranks_to_avg)
-                
-                grade = "F"
-                if avg_rank <= 2.0: grade = "S+"
-                elif avg_rank <= 3.0: grade = "S"
-                elif avg_rank <= 4.0: grade = "A"
-                elif avg_rank <= 5.5: grade = "B"
-                elif avg_rank <= 7.0: grade = "C"
-                elif avg_rank <= 8.5: grade = "D"
-                
-                embed.add_field(name="🏆 Match Grade", value=f"**{grade}** (Avg Rank: #{avg_rank:.1f}/10)", inline=False)
-
-                def format_stat(val, rank, top_val, top_hero):
-                    if rank == 1:
-                        return f"**{val}**\n🥇 Match Leader!"
-                    return f"**{val}**\nRank #{rank}\n(Top: {top_val} by {top_hero})"
-
-                embed.add_field(name="GPM", value=format_stat(gpm, gpm_rank, top_gpm, top_gpm_hero), inline=True)
-                embed.add_field(name="XPM", value=format_stat(xpm, xpm_rank, top_xpm, top_xpm_hero), inline=True)
-                embed.add_field(name="Hero Damage", value=format_stat(hd, hd_rank, top_hd, top_hd_hero), inline=True)
-                embed.add_field(name="Tower Damage", value=format_stat(td, td_rank, top_td, top_td_hero), inline=True)
-                embed.add_field(name="Last Hits", value=format_stat(lh, lh_rank, top_lh, top_lh_hero), inline=True)
-                embed.add_field(name="\u200b", value="\u200b", inline=True) # Spacer for alignment
+@bot.command()
+async def lobby(ctx, match_id: Optional[int] = None):
+    """Grades all ten players of a match (your last match by default)."""
+    if match_id is None:
+        cached = DETAILED_LAST_MATCH_CACHE.get(str(ctx.author.id))
+        if cached and cached[0]:
+            match_id = cached[0].get('match_id')
+        else:
+            steam_id = REGISTRY.get(str(ctx.author.id))
+            if not steam_id:
+                await ctx.send("❌ Not registered. Use `!register <steam_id>` to register, or give me a match id.")
+                return
+            try:
+                match_id = await opendota.get_latest_match_id(OPENDOTA, steam_id)
+            except opendota.RateLimitException:
+                await ctx.send("Even i have a limit. Go next, try again later. When you come back from feeding.")
+                return
+            except (opendota.NoMatchesException, opendota.PlayerDataException):
+                await ctx.send(f"No recent matches found for **{ctx.author.display_name}**.")
+                return
 
-            else:
-                # Fallback if detailed stats fail
-                embed.add_field(
-                    name="Performance",
-                    value=f"**GPM:** {gpm}\n"
-                          f"**XPM:** {xpm}\n"
-                          f"**Last Hits:** {lh}\n"
-                          f"**Hero Damage:** {hd}\n"
-                          f"**Tower Damage:** {td}",
-                    inline=False
-                )
-
-            if analysis['highlights']:
-                embed.add_field(name="📋 Match Highlights", value="\n".join(analysis['highlights']), inline=False)
-
-            await ctx.send(embed=embed, file=image_file)
+    try:
+        status_code, d_data = await OPENDOTA.get_match(match_id)
+    except Exception as e:
+        await ctx.send(f"An unexpected error occurred: {e}")
+        print(f"Exception in !lobby: {repr(e)}")
+        return
+    if status_code == 429:
+        await ctx.send("Even i have a limit. Go next, try again later. When you come back from feeding.")
+        return
+    if status_code != 200 or not d_data or not d_data.get('players'):
+        await ctx.send(f"Couldn't get match `{match_id}` from OpenDota. Maybe it's not parsed yet, maybe you made it up.")
+        return
 
-        except opendota.NoMatchesException:
-            await ctx.send(f"No recent matches found for **{target.display_name}**.")
-        except Exception as e:
-            await ctx.send(f"An unexpected error occurred: {e}")
-            print(f"Exception in !status: {repr(e)}")
+    results = opendota.analyze_lobby(d_data)
+    tracked = REGISTRY.tracked()
+
+    def format_player(r):
+        h_name = HEROES.names.get(r['hero_id'], "Unknown Hero")
+        d_id = tracked.get(str(r['account_id']))
+        who = f" <@{d_id}>" if d_id else ""
+        label = r['status'].replace(" ALERT", "").title()
+        return f"`{r['grade']:<2}` **{h_name}**{who} `{r['kda']}` {r['approximated_role']} · {label}"
+
+    radiant_win = d_data.get('radiant_win', False)
+    embed = discord.Embed(title=f"🏟️ Lobby Report for Match {match_id}", color=discord.Color.dark_teal())
+    for radiant, team_name in ((True, "Radiant"), (False, "Dire")):
+        team = sorted((r for r in results if r['is_radiant'] == radiant), key=lambda r: r['avg_rank'])
+        result_str = "🏆 WON" if radiant == radiant_win else "💀 LOST"
+        embed.add_field(name=f"{team_name} ({result_str})", value="\n".join(format_player(r) for r in team) or "Nobody", inline=False)
+    embed.add_field(
+        name="Match Details", 
+        value=f"[Dotabuff](https://www.dotabuff.com/matches/{match_id}) | [OpenDota](https://www.opendota.com/matches/{match_id})",
+        inline=False
+    )
+    await ctx.send(embed=embed)
 
 @bot.command()
 async def toxic(ctx, member: Optional[discord.Member] = None, *, message: str = ""):
@@ -586,22 +772,21 @@ async def toxic(ctx, member: Optional[discord.Member] = None, *, message: str =
                 "num_ctx": 2048, "stop": ["MESSAGE:", "RECENT_HISTORY:", "User:", "FLAME:", "TARGET_STATS:"]
             }
         }
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(url, json=payload, timeout=15) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        raw_roast = data['response'].strip()
-                        clean_roast = raw_roast.split('\n')[0] 
-                        sentences = re.split(r'(?<=[.!?]) +', clean_roast)
-                        final_roast = " ".join(sentences[:2]).strip()
-                        final_roast = re.sub(r'\(.*\)', '', final_roast) 
-                        await ctx.send(f"{target.mention} {final_roast}")
-                    else:
-                        await ctx.send("Server diff, I'm lagging pizdec.")
-            except Exception as e:
-                print(f"Error: {e}")
-                await ctx.send("Ollama is offline. Go next game raki.")
+        try:
+            async with http_session().post(url, json=payload, timeout=aiohttp.ClientTimeout(total=15)) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    raw_roast = data['response'].strip()
+                    clean_roast = raw_roast.split('\n')[0] 
+                    sentences = re.split(r'(?<=[.!?]) +', clean_roast)
+                    final_roast = " ".join(sentences[:2]).strip()
+                    final_roast = re.sub(r'\(.*\)', '', final_roast) 
+                    await ctx.send(f"{target.mention} {final_roast}")
+                else:
+                    await ctx.send("Server diff, I'm lagging pizdec.")
+        except Exception as e:
+            print(f"Error: {e}")
+            await ctx.send("Ollama is offline. Go next game raki.")
 
 @bot.command()
 @commands.cooldown(1, 60, commands.BucketType.user)
@@ -613,35 +798,23 @@ async def vocal(ctx, *, sound_name: Optional[str] = None):
 
     channel = ctx.author.voice.channel
     
-    sound_dir = "sounds"
-    if not os.path.exists(sound_dir):
+    if not SOUNDS.exists:
         await ctx.send("No sound server found.")
         return
         
-    files = [f for f in os.listdir(sound_dir) if f != ".gitkeep"]
-    if not files:
+    if not SOUNDS.files:
         await ctx.send("The sound server is empty. Upload some sounds.")
         return
 
-    selected_file = None
     if sound_name:
-        search = sound_name.lower()
-        matches = [f for f in files if search in f.lower()]
-        
-        if matches:
-            # Prioritize exact match (ignoring extension)
-            exact_matches = [f for f in matches if os.path.splitext(f)[0].lower() == search]
-            if exact_matches:
-                selected_file = exact_matches[0]
-            else:
-                selected_file = matches[0]
-        else:
+        selected_file = SOUNDS.find(sound_name)
+        if not selected_file:
             await ctx.send(f"Couldn't find sound '{sound_name}'.")
             return
     else:
-        selected_file = random.choice(files)
+        selected_file = SOUNDS.choice()
 
-    file_path = os.path.join(sound_dir, selected_file)
+    file_path = SOUNDS.path(selected_file)
 
     try:
         voice_client = ctx.voice_client
@@ -654,11 +827,10 @@ async def vocal(ctx, *, sound_name: Optional[str] = None):
         elif voice_client.channel != channel:
              await voice_client.move_to(channel)
 
+        # Pre-encoded Opus with the volume baked in, live ffmpeg until it is cached
+        source = await SOUND_CACHE.source(file_path)
         if voice_client.is_playing():
             voice_client.stop()
-
-        # using ffmpeg filter to lower volume
-        source = discord.FFmpegPCMAudio(file_path, options='-filter:a "volume=0.4"')
         voice_client.play(source)
         await ctx.send(f"🔊 Playing `{selected_file.replace('.mp3', '')}`")
         
@@ -680,43 +852,49 @@ async def on_voice_state_update(member, before, after):
         
         # If bot is connected and the user joined the bot's channel
         if voice_client and voice_client.channel == after.channel:
-            greetings_dir = "greetings"
-            if os.path.exists(greetings_dir):
-                # Get all files, ignoring hidden ones
-                files = [f for f in os.listdir(greetings_dir) 
-                        if os.path.isfile(os.path.join(greetings_dir, f)) and not f.startswith('.')]
-                
-                print(f"DEBUG: Found greeting files: {files}")
-
-                if files:
-                    selected_file = random.SystemRandom().choice(files)
-                    file_path = os.path.join(greetings_dir, selected_file)
-                    
-                    try:
-                        # Wait 1 second before playing greeting
-                        await asyncio.sleep(1)
-
-                        if voice_client.is_playing():
-                            voice_client.stop()
-                            
-                        # using ffmpeg filter to lower volume
-                        source = discord.FFmpegPCMAudio(file_path, options='-filter:a "volume=0.4"')
-                        voice_client.play(source)
-                        print(f"Played greeting {selected_file} for {member.display_name}")
-                    except Exception as e:
-                        print(f"Failed to play greeting: {e}")
+            selected_file = GREETINGS.choice(random.SystemRandom())
+            if selected_file:
+                try:
+                    # In-memory Opus once the cache is warm; queued so it never stops a playing sound
+                    source = await SOUND_CACHE.source(GREETINGS.path(selected_file))
+                    VOICE_QUEUE.enqueue(member.guild, source, f"greeting {selected_file} for {member.display_name}")
+                except Exception as e:
+                    print(f"Failed to play greeting: {e}")
+
+@bot.event
+async def on_member_join(member):
+    members.MEMBERS.forget(member.guild.id, member.id)
+
+@bot.event
+async def on_member_remove(member):
+    members.MEMBERS.forget(member.guild.id, member.id)
 
 @bot.event
 async def on_command_error(ctx, error):
     """Handles errors, specifically for unregistered commands."""
     if isinstance(error, commands.CommandNotFound):
-        if SLANGS:
-            await ctx.send(random.choice(SLANGS))
+        # Don't build the corpus on the event loop if startup hasn't yet
+        if not await STARTUP.wait(('corpus',), timeout=config.STARTUP_COMMAND_TIMEOUT):
+            return
+        if CORPUS.slangs:
+            await ctx.send(random.choice(CORPUS.slangs))
     elif isinstance(error, commands.CommandOnCooldown):
         await ctx.send(f"Usor in pula mea, mai asteapta {error.retry_after:.1f}s, in slbz sa te bata.")
     else:
         print(f"An unhandled error occurred: {error}")
 
 # --- Run Bot ---
+async def main():
+    discord.utils.setup_logging()
+    async with bot:
+        try:
+            await bot.start(config.TOKEN)
+        finally:
+            await flush_poller_state()
+            await REGISTRY.flush()
+            await OPENDOTA.close()
+            if _http_session is not None:
+                await _http_session.close()
+
 if __name__ == "__main__":
-    bot.run(config.TOKEN)
+    asyncio.run(main())
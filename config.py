@@ -18,40 +18,58 @@ except Exception:
     CHANNEL_ID = None
 
 # --- DATA FILE LOADING ---
-def load_users():
-    if os.path.exists('users.json'):
-        with open('users.json', 'r') as f:
-            return json.load(f)
+def load_poller_state():
+    """Loads the last seen match id per steam id saved by the poller."""
+    if os.path.exists(POLLER_STATE_FILE):
+        try:
+            with open(POLLER_STATE_FILE, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"WARNING: Could not read {POLLER_STATE_FILE}: {e}. Starting with a fresh baseline.")
     return {}
 
+def save_json_atomic(path, data):
+    """Writes JSON to a temp file and renames it over `path`, so a crash never leaves a half-written file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# Used when a corpus file is missing
+DEFAULT_MESSAGES = {
+    "uncarryable": ["Team was too heavy."],
+    "feeder": ["Literally a creep."],
+    "smurf_alert": ["Reported for smurfing."],
+    "solid_performance": ["Good game, well played."],
+    "carried": ["Got carried like a dog."]
+}
+DEFAULT_ROASTS = {
+    "generic_roasts": ["I couldn't find any roasts, just like you can't find any wins with {hero_name}."]
+}
+DEFAULT_SLANGS = ["Silence, fool."]
+
 def load_messages():
     if os.path.exists('messages.json'):
         with open('messages.json', 'r') as f:
             return json.load(f)
     print("WARNING: messages.json not found. Using default messages.")
-    return {
-        "uncarryable": ["Team was too heavy."],
-        "feeder": ["Literally a creep."],
-        "smurf_alert": ["Reported for smurfing."],
-        "solid_performance": ["Good game, well played."],
-        "carried": ["Got carried like a dog."]
-    }
+    return DEFAULT_MESSAGES
 
 def load_roasts():
     if os.path.exists('roasts.json'):
         with open('roasts.json', 'r') as f:
             return json.load(f)
     print("WARNING: roasts.json not found. Using default roasts.")
-    return {
-        "generic_roasts": ["I couldn't find any roasts, just like you can't find any wins with {hero_name}."]
-    }
+    return DEFAULT_ROASTS
 
 def load_slangs():
     if os.path.exists('slangs.json'):
         with open('slangs.json', 'r') as f:
             return json.load(f)
     print("WARNING: slangs.json not found. Using default slang.")
-    return ["Silence, fool."]
+    return DEFAULT_SLANGS
 
 # --- STATIC MAPPINGS ---
 MEMBER_NAMES = {
@@ -74,6 +92,67 @@ RANK_NAMES = {
 }
 
 DATABASE_FILE = 'users.json'
+MATCH_STORE_FILE = 'matches.db'
+POLLER_STATE_FILE = 'poller_state.json'
+HERO_SNAPSHOT_FILE = 'heroes.json'
+# Hero data is downloaded again this often; a failed download is retried after
+# HERO_RETRY_BASE seconds, doubling up to HERO_RETRY_MAX
+HERO_REFRESH_INTERVAL = 24 * 3600
+HERO_RETRY_BASE = 30
+HERO_RETRY_MAX = 1800
+# Compiled messages/roasts/slangs, rebuilt when any of the JSON sources change
+CORPUS_CACHE_FILE = 'corpus.cache'
+# How often the JSON sources are checked for edits while the bot runs
+CORPUS_WATCH_SECONDS = 10
+IMAGES_DIR = 'images'
+# Set to a URL template such as "https://cdn.example.com/heroes/{key}.png" to link
+# hero thumbnails instead of uploading the local portrait with every message
+HERO_THUMBNAIL_URL = os.environ.get('HERO_THUMBNAIL_URL')
+# Sounds are pre-encoded to Opus here with the playback volume baked in
+SOUND_CACHE_DIR = 'sound_cache'
+SOUND_VOLUME = 0.4
+SOUND_LOUDNORM = os.environ.get('SOUND_LOUDNORM', '0') == '1'
+MATCH_STORE_MAX_BYTES = 64 * 1024 * 1024
+# Rank and Steam avatar/name rarely change; older profiles are refreshed in the background
+PROFILE_TTL = int(os.environ.get('PROFILE_TTL', 6 * 3600))
+
+# How long member lookups for mentions are cached; misses (people who left) are kept longer
+MEMBER_CACHE_TTL = 600
+MEMBER_MISS_TTL = 3600
+
+# Longest a command waits for the startup stages it needs (hero data, messages)
+STARTUP_COMMAND_TIMEOUT = 15
+
+# --- OPENDOTA QUOTA ---
+# Free tier is 60 requests a minute and 2000 a day; set these to your plan's limits
+# when using an API key (OPENDOTA_RATE_PER_DAY=0 means no daily cap)
+OPENDOTA_API_KEY = os.environ.get('OPENDOTA_API_KEY')
+OPENDOTA_RATE_PER_MINUTE = int(os.environ.get('OPENDOTA_RATE_PER_MINUTE', 60))
+OPENDOTA_RATE_PER_DAY = int(os.environ.get('OPENDOTA_RATE_PER_DAY', 2000))
+# Requests of the daily quota the poller leaves for commands
+OPENDOTA_DAILY_RESERVE = int(os.environ.get('OPENDOTA_DAILY_RESERVE', 50))
+# Retries for 429/5xx responses, and the longest a request waits for quota before giving up
+OPENDOTA_MAX_RETRIES = 3
+OPENDOTA_MAX_WAIT = 30
+
+# --- POLLER TUNING ---
+# The poller wakes every POLL_TICK_SECONDS and only checks players whose next poll is due.
+# Players are checked every POLL_ACTIVE_INTERVAL seconds for POLL_SESSION_WINDOW seconds
+# after a new match, otherwise the wait doubles from POLL_BASE_INTERVAL up to POLL_MAX_INTERVAL.
+POLL_TICK_SECONDS = 15
+POLL_ACTIVE_INTERVAL = 120
+POLL_BASE_INTERVAL = 300
+POLL_MAX_INTERVAL = 3600
+POLL_SESSION_WINDOW = 2 * 3600
+POLL_JITTER = 0.2
+POLL_CONCURRENCY = int(os.environ.get('POLL_CONCURRENCY', 4))
+POLL_USER_TIMEOUT = 30
+# Idle players' polls are put off this long while commands need the OpenDota quota
+POLL_DEFER_SECONDS = 60
+POLL_RATE_LIMIT_PAUSE = 60
+POLL_RATE_LIMIT_RETRIES = 1
+# Post one combined embed when several tracked players finish the same match (off by default)
+PARTY_REPORTS = os.environ.get('PARTY_REPORTS', '0') == '1'
 
 def validate():
     """Checks if essential configuration is loaded."""
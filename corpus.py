@@ -0,0 +1,308 @@
+import asyncio
+import json
+import os
+import pickle
+import random
+import string
+import threading
+
+import config
+from heroes import normalize_name
+
+CACHE_VERSION = 1
+# Raw corpora compiled together into one cache file
+SOURCES = ('messages.json', 'roasts.json', 'slangs.json', 'random_roasts.json')
+
+# Placeholders each template family may use
+HERO_FIELDS = frozenset(('hero_name',))
+ROLE_TRANSITION_FIELDS = frozenset(('last_role', 'position'))
+
+_FORMATTER = string.Formatter()
+
+
+def compile_template(text, fields=frozenset()):
+    """
+    Pre-splits a str.format template. Text without placeholders comes back as
+    a plain str; otherwise a tuple alternating literal text and field names.
+    Raises ValueError for placeholders outside `fields` or with format specs.
+    """
+    parts, literal = [], []
+    for text_part, field, spec, conversion in _FORMATTER.parse(text):
+        literal.append(text_part)
+        if field is None:
+            continue
+        if field not in fields or spec or conversion:
+            raise ValueError(f"unsupported placeholder {{{field}}} in {text!r}")
+        parts.append(''.join(literal))
+        parts.append(field)
+        literal = []
+    if not parts:
+        return ''.join(literal)
+    parts.append(''.join(literal))
+    return tuple(parts)
+
+
+def render(template, **fields):
+    """Fills a compiled template."""
+    if type(template) is str:
+        return template
+    return ''.join(part if i % 2 == 0 else str(fields[part]) for i, part in enumerate(template))
+
+
+def _compile_list(name, texts, fields=frozenset()):
+    compiled = []
+    for text in texts:
+        try:
+            compiled.append(compile_template(text, fields))
+        except ValueError as e:
+            print(f"WARNING: Skipping {name} entry: {e}")
+    return tuple(compiled)
+
+
+def _check_lines(name, value):
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"{name} must be a list of strings")
+
+
+def _check_groups(name, value):
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} must be an object")
+    for key, lines in value.items():
+        _check_lines(f"{name}.{key}", lines)
+
+
+def _parse(name, loader):
+    try:
+        return loader()
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}") from e
+
+
+def _load_random_roasts():
+    if os.path.exists('random_roasts.json'):
+        with open('random_roasts.json', 'r') as f:
+            return json.load(f).get('roasts', [])
+    return []
+
+
+def compile_corpus():
+    """
+    Parses the raw JSON corpora into the compact form stored in the cache.
+    Raises ValueError if a file isn't valid JSON or doesn't have the expected shape.
+    """
+    return compile_sources(
+        _parse('messages.json', config.load_messages),
+        _parse('roasts.json', config.load_roasts),
+        _parse('slangs.json', config.load_slangs),
+        _parse('random_roasts.json', _load_random_roasts),
+    )
+
+
+def compile_defaults():
+    """The built-in lines from config, compiled like the real corpus."""
+    return compile_sources(config.DEFAULT_MESSAGES, config.DEFAULT_ROASTS, config.DEFAULT_SLANGS, [])
+
+
+def compile_sources(messages, roasts, slangs, random_roasts):
+    """Checks and compiles already-parsed corpora. Raises ValueError for an unexpected shape."""
+    _check_groups('messages.json', messages)
+    if not isinstance(roasts, dict):
+        raise ValueError("roasts.json must be an object")
+    _check_groups('roasts.json hero_roasts', roasts.get('hero_roasts', {}))
+    _check_groups('roasts.json performance_roasts', roasts.get('performance_roasts', {}))
+    _check_lines('roasts.json generic_roasts', roasts.get('generic_roasts', []))
+    _check_lines('roasts.json role_transition_comments', roasts.get('role_transition_comments', []))
+    _check_lines('slangs.json', slangs)
+    _check_lines('random_roasts.json roasts', random_roasts)
+
+    hero_roasts = {}
+    for name, texts in roasts.get('hero_roasts', {}).items():
+        # Keys mix internal and localized names; aliases of one hero are merged
+        key = normalize_name(name)
+        hero_roasts[key] = hero_roasts.get(key, ()) + _compile_list(f"hero_roasts.{name}", texts)
+    return {
+        'messages': {k: tuple(v) for k, v in messages.items()},
+        'hero_roasts': hero_roasts,
+        'performance_roasts': {
+            k: _compile_list(f"performance_roasts.{k}", v, HERO_FIELDS)
+            for k, v in roasts.get('performance_roasts', {}).items()
+        },
+        # random_roasts.json holds more {hero_name} lines for suggested heroes
+        'generic_roasts': (
+            _compile_list('generic_roasts', roasts.get('generic_roasts', []), HERO_FIELDS)
+            + _compile_list('random_roasts', random_roasts, HERO_FIELDS)
+        ),
+        'role_transitions': _compile_list(
+            'role_transition_comments', roasts.get('role_transition_comments', []), ROLE_TRANSITION_FIELDS
+        ),
+        'slangs': tuple(slangs),
+    }
+
+
+def source_stamps(sources=SOURCES):
+    """(mtime, size) of every source file, None for missing ones."""
+    stamps = {}
+    for path in sources:
+        try:
+            st = os.stat(path)
+            stamps[path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+class Corpus:
+    """
+    Messages, roasts and slangs for the whole bot, compiled once into
+    cache_path. The raw JSON is only parsed again when a source file's mtime
+    or size changes; otherwise the compiled cache is loaded on first use.
+    reload() picks up edits while the bot runs, swapping the whole corpus at once.
+    If the sources are invalid, the last compiled cache (or the built-in
+    defaults) stays in use until an edit fixes them. Builds are single-flight:
+    a caller arriving while another thread builds waits for that result.
+    Hero roasts are indexed by hero id against a HeroCatalog.
+    """
+    __slots__ = ('cache_path', 'sources', '_data', '_stamps', '_hero_index', '_hero_index_key', '_lock')
+
+    def __init__(self, cache_path, sources=SOURCES):
+        self.cache_path = cache_path
+        self.sources = sources
+        self._data = None
+        self._stamps = None
+        self._hero_index = {}
+        self._hero_index_key = None
+        self._lock = threading.RLock()
+
+    def _read_cache(self, stamps=None):
+        """Returns the cached corpus if it was compiled from `stamps` (any sources if None)."""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"WARNING: Ignoring {self.cache_path}: {e}")
+            return None
+        if cached.get('version') != CACHE_VERSION or (stamps is not None and cached.get('stamps') != stamps):
+            return None
+        return cached['data']
+
+    def _write_cache(self, stamps, data):
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': CACHE_VERSION, 'stamps': stamps, 'data': data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"WARNING: Could not write {self.cache_path}: {e}")
+
+    def build(self, strict=False):
+        """
+        Loads the compiled corpus once, recompiling (and rewriting the cache) if a source changed.
+        Invalid sources raise ValueError with strict=True; otherwise they are
+        reported and the fallback corpus is used.
+        """
+        with self._lock:
+            if self._data is not None:
+                return self._data
+            stamps = source_stamps(self.sources)
+            data = self._read_cache(stamps)
+            if data is None:
+                try:
+                    data = self._compile(stamps)
+                except Exception as e:
+                    if strict:
+                        raise
+                    data = self._fallback(e)
+            self._data, self._stamps = data, stamps
+            return data
+
+    def _fallback(self, error):
+        data, used = self._read_cache(), 'the last compiled corpus'
+        if data is None:
+            data, used = compile_defaults(), 'the built-in defaults'
+        print(f"WARNING: Could not compile messages, roasts and slangs, using {used} until they are fixed: {error}")
+        return data
+
+    def _compile(self, stamps):
+        # One writer at a time for the cache's temp file
+        with self._lock:
+            data = compile_corpus()
+            self._write_cache(stamps, data)
+        print(f"✅ Compiled message corpus into {self.cache_path}.")
+        return data
+
+    async def reload(self):
+        """
+        Recompiles off the event loop if a source file changed and swaps the new corpus in.
+        Invalid edits are reported and the current corpus is kept. Returns True if it swapped.
+        """
+        if self._data is None:
+            # Nothing loaded yet: a first build, falling back if the sources are invalid
+            await asyncio.to_thread(self.build)
+            return True
+        stamps = await asyncio.to_thread(source_stamps, self.sources)
+        if stamps == self._stamps:
+            return False
+        try:
+            data = await asyncio.to_thread(self._compile, stamps)
+        except Exception as e:
+            # Remember the stamps so the same broken edit isn't retried every check
+            self._stamps = stamps
+            print(f"WARNING: Keeping the current messages and roasts, reload failed: {e}")
+            return False
+        self._data, self._stamps = data, stamps
+        print("✅ Reloaded messages, roasts and slangs.")
+        return True
+
+    @property
+    def data(self):
+        # Only before the startup build is done; waits for it if it is running
+        if self._data is None:
+            self.build()
+        return self._data
+
+    @property
+    def messages(self):
+        """Flavor lines per performance msg_key."""
+        return self.data['messages']
+
+    @property
+    def slangs(self):
+        return self.data['slangs']
+
+    @property
+    def performance_roasts(self):
+        return self.data['performance_roasts']
+
+    @property
+    def generic_roasts(self):
+        """Roasts for any hero, taking {hero_name}."""
+        return self.data['generic_roasts']
+
+    def hero_roasts(self, catalog, hero_id):
+        """Roasts written for one hero (empty if it has none)."""
+        data = self.data
+        index_key = (id(data), catalog.fetched_at, len(catalog.names))
+        if index_key != self._hero_index_key:
+            by_name = data['hero_roasts']
+            index = {}
+            for h_id, localized in catalog.names.items():
+                aliases = {normalize_name(localized), normalize_name(catalog.image_keys.get(h_id, ''))}
+                lines = tuple(line for alias in sorted(aliases) for line in by_name.get(alias, ()))
+                if lines:
+                    index[h_id] = lines
+            self._hero_index, self._hero_index_key = index, index_key
+        return self._hero_index.get(hero_id, ())
+
+    def role_transition(self, last_role, position):
+        """A random comment on switching from last_role to position, or an empty string."""
+        templates = self.data['role_transitions']
+        if not templates:
+            return ""
+        return render(random.choice(templates), last_role=last_role, position=position)
+
+
+if __name__ == '__main__':
+    # Build step: python corpus.py
+    Corpus(config.CORPUS_CACHE_FILE).build(strict=True)
@@ -0,0 +1,116 @@
+import asyncio
+
+import discord
+
+# Discord's per-message limits
+MAX_EMBEDS = 10
+MAX_FILES = 10
+MAX_EMBED_CHARS = 6000
+MAX_CONTENT_CHARS = 2000
+
+
+class Outgoing:
+    """One piece of a channel message: a line of text, or an embed with its optional attachment."""
+    __slots__ = ('text', 'embed', 'file')
+
+    def __init__(self, text=None, embed=None, file=None):
+        self.text = text
+        self.embed = embed
+        self.file = file
+
+
+def pack(items):
+    """
+    Groups items into as few messages as Discord's limits allow, keeping their order.
+    Text after an embed starts a new message, since content renders above embeds.
+    Returns a list of (content, embeds, files).
+    """
+    batches = []
+    lines, embeds, files, names, chars = [], [], [], set(), 0
+
+    def close():
+        if lines or embeds:
+            batches.append(("\n".join(lines) or None, embeds, files))
+
+    for item in items:
+        if item.text is not None:
+            content_len = sum(len(line) + 1 for line in lines) + len(item.text)
+            if embeds or (lines and content_len > MAX_CONTENT_CHARS):
+                close()
+                lines, embeds, files, names, chars = [], [], [], set(), 0
+            lines.append(item.text)
+        if item.embed is not None:
+            size = len(item.embed)
+            new_file = item.file is not None and item.file.filename not in names
+            if embeds and (len(embeds) >= MAX_EMBEDS or chars + size > MAX_EMBED_CHARS or (new_file and len(files) >= MAX_FILES)):
+                close()
+                lines, embeds, files, names, chars = [], [], [], set(), 0
+                new_file = item.file is not None
+            embeds.append(item.embed)
+            chars += size
+            # Embeds showing the same hero share one attachment
+            if new_file:
+                files.append(item.file)
+                names.add(item.file.filename)
+    close()
+    return batches
+
+
+class DeliveryQueue:
+    """
+    Outbound messages per channel. Items queued within `linger` seconds of each
+    other are packed into as few messages as possible (up to 10 embeds and
+    6000 embed characters each) and sent in order by one sender per channel.
+    A 429 from Discord pauses that channel for its retry_after and resends.
+    """
+    def __init__(self, linger=0.5, max_retries=3):
+        self.linger = linger
+        self.max_retries = max_retries
+        self._pending = {}
+        self._senders = {}
+
+    def deliver(self, channel, items):
+        """Queues items for a channel. Returns a future that resolves once they are all sent."""
+        done = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(channel.id, []).append((list(items), done))
+        sender = self._senders.get(channel.id)
+        if sender is None or sender.done():
+            self._senders[channel.id] = asyncio.ensure_future(self._run(channel))
+        return done
+
+    async def _run(self, channel):
+        while self._pending.get(channel.id):
+            await asyncio.sleep(self.linger)
+            queued = self._pending.pop(channel.id, [])
+            items = [item for batch, _ in queued for item in batch]
+            try:
+                for content, embeds, files in pack(items):
+                    await self._send(channel, content, embeds, files)
+            except Exception as e:
+                print(f"Failed to deliver to #{getattr(channel, 'name', channel.id)}: {e}")
+                for _, done in queued:
+                    if not done.done():
+                        done.set_exception(e)
+                continue
+            for _, done in queued:
+                if not done.done():
+                    done.set_result(None)
+
+    async def _send(self, channel, content, embeds, files):
+        kwargs = {'content': content, 'embeds': embeds}
+        if files:
+            kwargs['files'] = files
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await channel.send(**kwargs)
+            except discord.HTTPException as e:
+                if e.status != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = float(e.response.headers.get('Retry-After', 1)) if e.response is not None else 1.0
+                print(f"Discord rate limit on #{getattr(channel, 'name', channel.id)}, retrying in {retry_after:.1f}s.")
+                await asyncio.sleep(retry_after)
+                for f in files:
+                    f.reset()
+
+
+DELIVERY = DeliveryQueue()
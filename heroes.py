@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import re
+import time
+from array import array
+from bisect import bisect_left
+
+import config
+
+SNAPSHOT_VERSION = 1
+
+# Dota positions accepted by !random and the hero roles that qualify for each
+POSITION_ROLES = {
+    "carry": ("Carry",),
+    "mid": ("Nuker", "Disabler", "Escape"),
+    "offlane": ("Durable", "Initiator", "Disabler"),
+    "support": ("Support",),
+}
+
+# Minimum trigram similarity (Dice coefficient) for a fuzzy name match
+FUZZY_THRESHOLD = 0.3
+
+
+def normalize_name(name):
+    """Lowercases a hero name and drops everything but letters and digits ("Nature's Prophet" -> "naturesprophet")."""
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class HeroCatalog:
+    """
+    Shared hero data (names, image keys, roles) for the whole bot.
+    Loaded synchronously from a local snapshot at startup and kept fresh from
+    OpenDota in the background; a refresh swaps every mapping in at once.
+    """
+    __slots__ = (
+        'snapshot_path', 'fetched_at', 'names', 'image_keys', 'lookup', 'roles',
+        'all_ids', '_pools', '_exact', '_prefix_keys', '_prefix_ids', '_grams', '_gram_index',
+        '_refresh_task', '_first_refresh',
+    )
+
+    def __init__(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+        self._refresh_task = None
+        self._first_refresh = None
+        self._apply([], None)
+
+    def _apply(self, h_data, fetched_at):
+        names, image_keys, lookup, roles = {}, {}, {}, {}
+        exact, grams, gram_index = {}, {}, {}
+        for h in h_data:
+            h_id = h['id']
+            localized = h['localized_name']
+            img_key = h['name'].replace('npc_dota_hero_', '')
+            names[h_id] = localized
+            image_keys[h_id] = img_key
+            lookup[localized.lower()] = img_key
+            lookup[img_key.lower()] = img_key
+            roles[h_id] = h.get('roles', [])
+            for alias in {normalize_name(localized), normalize_name(img_key)}:
+                exact[alias] = h_id
+                grams[alias] = _trigrams(alias)
+                for gram in grams[alias]:
+                    gram_index.setdefault(gram, set()).add(alias)
+
+        all_ids = array('H', sorted(names))
+        pools = {
+            position: array('H', [h_id for h_id in all_ids if any(r in roles[h_id] for r in wanted)])
+            for position, wanted in POSITION_ROLES.items()
+        }
+        prefix_keys = sorted(exact)
+
+        # Plain attribute rebinds with no await in between, readers never see a half-built catalog
+        self.names, self.image_keys, self.lookup, self.roles = names, image_keys, lookup, roles
+        self.all_ids, self._pools = all_ids, pools
+        self._exact, self._grams, self._gram_index = exact, grams, gram_index
+        self._prefix_keys, self._prefix_ids = prefix_keys, [exact[k] for k in prefix_keys]
+        self.fetched_at = fetched_at
+
+    def pool(self, position=None):
+        """
+        Returns the hero ids eligible for a position (all heroes if position is None).
+        Returns None for a position that isn't in POSITION_ROLES.
+        """
+        if position is None:
+            return self.all_ids
+        return self._pools.get(position.lower())
+
+    def find(self, query):
+        """
+        Resolves a (partial or misspelled) localized or internal hero name to a hero id.
+        Tries an exact match, then the shortest name starting with the query,
+        then the closest name by trigram similarity. Returns None if nothing is close.
+        """
+        q = normalize_name(query)
+        if not q:
+            return None
+        if q in self._exact:
+            return self._exact[q]
+
+        i = bisect_left(self._prefix_keys, q)
+        best = None
+        while i < len(self._prefix_keys) and self._prefix_keys[i].startswith(q):
+            if best is None or len(self._prefix_keys[i]) < len(self._prefix_keys[best]):
+                best = i
+            i += 1
+        if best is not None:
+            return self._prefix_ids[best]
+
+        q_grams = _trigrams(q)
+        shared = {}
+        for gram in q_grams:
+            for alias in self._gram_index.get(gram, ()):
+                shared[alias] = shared.get(alias, 0) + 1
+        best_alias, best_score = None, FUZZY_THRESHOLD
+        for alias, count in shared.items():
+            score = 2 * count / (len(q_grams) + len(self._grams[alias]))
+            if score > best_score:
+                best_alias, best_score = alias, score
+        return self._exact[best_alias] if best_alias else None
+
+    def load_snapshot(self):
+        """Loads the on-disk snapshot. Returns False if there is none or it can't be used."""
+        if not os.path.exists(self.snapshot_path):
+            print(f"WARNING: {self.snapshot_path} not found. Hero data will be available after the first download.")
+            return False
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+            if snapshot.get('version') != SNAPSHOT_VERSION:
+                print(f"WARNING: Ignoring {self.snapshot_path}, unsupported version {snapshot.get('version')}.")
+                return False
+            self._apply(snapshot['heroes'], snapshot.get('fetched_at'))
+        except Exception as e:
+            print(f"WARNING: Could not load {self.snapshot_path}: {e}")
+            return False
+        print(f"✅ Loaded {len(self.names)} heroes from snapshot.")
+        return True
+
+    async def refresh(self, client):
+        """Downloads /heroes, swaps it in and rewrites the snapshot. Never raises."""
+        try:
+            status, h_data = await client.get_json("/heroes")
+        except Exception as e:
+            print(f"❌ Failed to update hero data: {e}")
+            return False
+        if status != 200 or not h_data:
+            print("❌ Failed to update hero data.")
+            return False
+
+        fetched_at = time.time()
+        self._apply(h_data, fetched_at)
+        snapshot = {'version': SNAPSHOT_VERSION, 'fetched_at': fetched_at, 'heroes': h_data}
+        try:
+            await asyncio.to_thread(config.save_json_atomic, self.snapshot_path, snapshot)
+        except Exception as e:
+            print(f"WARNING: Could not write {self.snapshot_path}: {e}")
+        print("✅ Hero data updated successfully.")
+        return True
+
+    def start_refresh(self, client, interval=86400, retry_base=30, retry_max=1800):
+        """
+        Starts keeping the catalog fresh unless that is already running: a refresh
+        now and every `interval` seconds, with failures retried after an
+        exponential backoff from retry_base up to retry_max seconds.
+        Returns a future resolving to the result of the first attempt.
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._first_refresh = asyncio.get_running_loop().create_future()
+            self._refresh_task = asyncio.ensure_future(
+                self._keep_fresh(client, self._first_refresh, interval, retry_base, retry_max)
+            )
+        return self._first_refresh
+
+    async def _keep_fresh(self, client, first, interval, retry_base, retry_max):
+        delay = retry_base
+        while True:
+            ok = await self.refresh(client)
+            if not first.done():
+                first.set_result(ok)
+            if ok:
+                delay = retry_base
+                await asyncio.sleep(interval)
+            else:
+                print(f"Retrying the hero download in {delay:.0f}s.")
+                await asyncio.sleep(delay)
+                delay = min(retry_max, delay * 2)
@@ -0,0 +1,127 @@
+# Stats ranked across all ten players, in the order !status shows them
+RANKED_STATS = ('gold_per_min', 'xp_per_min', 'hero_damage', 'tower_damage', 'last_hits', 'assists', 'deaths')
+# Stats where a lower value ranks higher
+ASCENDING_STATS = frozenset(('deaths',))
+COLUMNS = RANKED_STATS + ('kills', 'denies')
+
+# Farm priority order within a team; everyone below these is a support
+FARM_ROLES = ("Carry", "Midlaner", "Offlaner")
+
+# Which ranks make up the !status grade for each approximated role
+GRADE_STATS = {
+    "Carry": ('gold_per_min', 'xp_per_min', 'hero_damage', 'tower_damage', 'last_hits'),
+    "Midlaner": ('gold_per_min', 'xp_per_min', 'hero_damage', 'tower_damage', 'last_hits'),
+    # Offlaners care about impact (HD, TD, Assists) and farm (XPM, GPM)
+    "Offlaner": ('xp_per_min', 'hero_damage', 'tower_damage', 'gold_per_min', 'assists'),
+    # Supports care about Assists, Survival (Deaths), Impact (HD), and Level (XPM)
+    # We ignore GPM/LH/TD as they are not primary support jobs
+    "Support": ('assists', 'deaths', 'hero_damage', 'xp_per_min'),
+}
+DEFAULT_GRADE_STATS = GRADE_STATS["Carry"]
+
+# (highest average rank, grade), checked in order; anything worse is an F
+GRADE_THRESHOLDS = ((2.0, "S+"), (3.0, "S"), (4.0, "A"), (5.5, "B"), (7.0, "C"), (8.5, "D"))
+
+
+class MatchFrame:
+    """
+    Column-oriented view of the players in a match.
+    Every stat is ranked once when the frame is built, so grades, leaders,
+    team aggregates, roles and highlights for any (or every) player are lookups.
+    """
+    __slots__ = ('players', 'is_radiant', 'columns', 'order', 'ranks', 'roles', 'team_max', '_by_slot')
+
+    def __init__(self, players):
+        self.players = list(players)
+        n = len(self.players)
+        self.is_radiant = [p.get('player_slot', 0) < 128 for p in self.players]
+        self.columns = {key: [p.get(key) or 0 for p in self.players] for key in COLUMNS}
+        self._by_slot = {p.get('player_slot'): i for i, p in enumerate(self.players)}
+
+        self.order = {}
+        self.ranks = {}
+        for key in RANKED_STATS:
+            col = self.columns[key]
+            order = sorted(range(n), key=col.__getitem__, reverse=key not in ASCENDING_STATS)
+            ranks = [0] * n
+            for pos, i in enumerate(order):
+                # Tied players share the better rank
+                if pos and col[i] == col[order[pos - 1]]:
+                    ranks[i] = ranks[order[pos - 1]]
+                else:
+                    ranks[i] = pos + 1
+            self.order[key] = order
+            self.ranks[key] = ranks
+
+        self.roles = ["Unknown"] * n
+        self.team_max = {}
+        last_hits, denies = self.columns['last_hits'], self.columns['denies']
+        for radiant in (True, False):
+            team = [i for i in range(n) if self.is_radiant[i] == radiant]
+            self.team_max[radiant] = {key: max((self.columns[key][i] for i in team), default=0) for key in COLUMNS}
+            # Role approximation based on farm priority
+            team.sort(key=lambda i: (last_hits[i], denies[i]), reverse=True)
+            for pos, i in enumerate(team):
+                self.roles[i] = FARM_ROLES[pos] if pos < len(FARM_ROLES) else "Support"
+
+    def __len__(self):
+        return len(self.players)
+
+    def index_of(self, player):
+        """Returns the frame row of a player dict from the same match, or None."""
+        return self._by_slot.get(player.get('player_slot'))
+
+    def team_metrics(self, radiant):
+        """Aggregate and average stats for one team, plus its player dicts and this frame."""
+        rows = [i for i, r in enumerate(self.is_radiant) if r == radiant]
+        players = [self.players[i] for i in rows]
+        metrics = {
+            'total_kills': sum(self.columns['kills'][i] for i in rows),
+            'total_gpm': sum(self.columns['gold_per_min'][i] for i in rows),
+            'total_lh': sum(self.columns['last_hits'][i] for i in rows),
+            'total_xpm': sum(self.columns['xp_per_min'][i] for i in rows),
+            'total_hero_damage': sum(self.columns['hero_damage'][i] for i in rows),
+            'avg_gpm': 0, 'avg_lh': 0, 'avg_xpm': 0, 'avg_hero_damage': 0,
+            'players': players, 'frame': self,
+        }
+        if rows:
+            metrics['avg_gpm'] = metrics['total_gpm'] / len(rows)
+            metrics['avg_lh'] = metrics['total_lh'] / len(rows)
+            metrics['avg_xpm'] = metrics['total_xpm'] / len(rows)
+            metrics['avg_hero_damage'] = metrics['total_hero_damage'] / len(rows)
+        return metrics
+
+    def leader(self, key):
+        """Returns the row of the best player for a ranked stat."""
+        return self.order[key][0]
+
+    def highlights(self, i, team_kills=None):
+        """Team-relative performance highlights for row i."""
+        team_max = self.team_max[self.is_radiant[i]]
+        col = self.columns
+        highlights = []
+        if col['gold_per_min'][i] >= team_max['gold_per_min']:
+            highlights.append("💰 Top GPM on team")
+        if col['hero_damage'][i] >= team_max['hero_damage']:
+            highlights.append("💥 Top hero damage on team")
+        if col['tower_damage'][i] >= team_max['tower_damage'] and col['tower_damage'][i] > 0:
+            highlights.append("🗼 Top tower damage on team")
+        if col['kills'][i] >= team_max['kills']:
+            highlights.append("🔪 Most kills on team")
+
+        if team_kills is None:
+            team_kills = sum(k for k, r in zip(col['kills'], self.is_radiant) if r == self.is_radiant[i])
+        if team_kills > 0:
+            kill_participation = min(1.0, (col['kills'][i] + col['assists'][i]) / team_kills)  # Cap at 100%
+            if kill_participation > 0.65:
+                highlights.append(f"⚔️ Involved in {kill_participation:.0%} of team's kills")
+        return highlights
+
+    def grade(self, i, role=None):
+        """Returns (grade, average rank) for row i, weighting the stats that matter for its role."""
+        stats = GRADE_STATS.get(role or self.roles[i], DEFAULT_GRADE_STATS)
+        avg_rank = sum(self.ranks[key][i] for key in stats) / len(stats)
+        for limit, grade in GRADE_THRESHOLDS:
+            if avg_rank <= limit:
+                return grade, avg_rank
+        return "F", avg_rank
@@ -0,0 +1,81 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class MatchStore:
+    """
+    On-disk SQLite cache for /matches/{id} payloads.
+    Finished matches never change, so a stored payload is served forever
+    until it is evicted (least recently used first) to stay under max_bytes.
+    """
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS matches ("
+            "match_id INTEGER PRIMARY KEY, payload BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS matches_last_access ON matches (last_access)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM matches").fetchone()[0]
+
+    def get(self, match_id):
+        """Returns the stored match payload, or None if it isn't cached."""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM matches WHERE match_id = ?", (int(match_id),)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE matches SET last_access = ? WHERE match_id = ?", (time.time(), int(match_id)))
+            self._conn.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, match_id, payload):
+        """Stores a match payload, evicting the least recently used matches if over budget."""
+        blob = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM matches WHERE match_id = ?", (int(match_id),)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO matches (match_id, payload, size, last_access) VALUES (?, ?, ?, ?)",
+                (int(match_id), blob, len(blob), time.time())
+            )
+            self._total += len(blob) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        while self._total > self.max_bytes:
+            rows = self._conn.execute("SELECT match_id, size FROM matches ORDER BY last_access LIMIT 32").fetchall()
+            if not rows:
+                self._total = 0
+                return
+            for match_id, size in rows:
+                if self._total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM matches WHERE match_id = ?", (match_id,))
+                self._total -= size
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_store(path, max_bytes):
+    """Opens the match store, returning None (no persistent cache) if it can't be opened."""
+    try:
+        return MatchStore(path, max_bytes)
+    except Exception as e:
+        print(f"WARNING: Could not open match store {os.path.abspath(path)}: {e}")
+        return None
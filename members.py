@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import config
+
+
+class MemberResolver:
+    """
+    Cached guild member lookups for rendering mentions.
+    Hits are kept for `ttl` seconds and misses for `negative_ttl`, so someone
+    who left the server costs one dictionary lookup per embed. Lookups never
+    call the REST API: a member missing from a guild that hasn't been chunked
+    yet starts one background chunk of that guild and is mentioned by id meanwhile.
+    """
+    def __init__(self, ttl=600, negative_ttl=3600, clock=time.monotonic):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._cache = {}
+        self._chunks = {}
+
+    def get(self, guild, discord_id):
+        """Returns the guild member with that id, or None if they can't be found right now."""
+        key = (guild.id, int(discord_id))
+        cached = self._cache.get(key)
+        now = self.clock()
+        if cached and cached[1] > now:
+            return cached[0]
+
+        member = guild.get_member(key[1])
+        if member is not None:
+            self._cache[key] = (member, now + self.ttl)
+        elif guild.chunked:
+            self._cache[key] = (None, now + self.negative_ttl)
+        else:
+            # Not a real miss yet, retried as soon as the chunk lands
+            self._cache[key] = (None, now + self.ttl)
+            self._start_chunk(guild)
+        return member
+
+    def _start_chunk(self, guild):
+        task = self._chunks.get(guild.id)
+        if task is None or task.done():
+            self._chunks[guild.id] = asyncio.ensure_future(self._chunk(guild))
+
+    async def _chunk(self, guild):
+        try:
+            await guild.chunk()
+        except Exception as e:
+            print(f"WARNING: Could not load the member list of {guild.name}: {e}")
+            return
+        # Forget the misses recorded while the member list was incomplete
+        for key in [k for k, (member, _) in self._cache.items() if k[0] == guild.id and member is None]:
+            del self._cache[key]
+
+    def forget(self, guild_id, discord_id):
+        """Drops a cached lookup, e.g. when the member joins or leaves."""
+        self._cache.pop((guild_id, int(discord_id)), None)
+
+    def mention(self, guild, discord_id, member_names_map):
+        """
+        Returns a mention for the member, or their bolded friendly name if they
+        are confirmed missing. Until the guild's member list is loaded, a raw
+        mention is used so the first alerts after a restart still ping.
+        """
+        member = self.get(guild, discord_id) if guild else None
+        if member:
+            return member.mention
+        if guild and not guild.chunked:
+            return f"<@{discord_id}>"
+        return f"**{member_names_map.get(str(discord_id), 'Dota Player')}**"
+
+
+MEMBERS = MemberResolver(config.MEMBER_CACHE_TTL, config.MEMBER_MISS_TTL)
@@ -1,9 +1,25 @@
 import aiohttp
+import asyncio
+import contextvars
 import discord
-import os
+import hashlib
+import json
 import random
+import time
 from collections import defaultdict
 
+import assets
+import members
+from rate_limit import QuotaLimiter
+from match_frame import MatchFrame
+
+OPENDOTA_API = "https://api.opendota.com/api"
+# Set by background work (the poller) so its requests queue behind interactive commands
+BACKGROUND = contextvars.ContextVar('opendota_background', default=False)
+
+# Responses worth retrying after a backoff (429 waits for its Retry-After instead)
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+
 # --- Custom Exceptions ---
 class RateLimitException(Exception):
     pass
@@ -14,6 +30,199 @@ class NoMatchesException(Exception):
 class PlayerDataException(Exception):
     pass
 
+class OpenDotaClient:
+    """
+    Long-lived HTTP client for the OpenDota API.
+    One pooled connector is shared by the poller and every command so
+    keep-alive connections and DNS lookups are reused between requests.
+    Every request spends from a QuotaLimiter sized to the account's
+    per-minute and per-day quota; a request that would have to wait more
+    than max_wait seconds for budget is answered with a local 429.
+    Requests made with BACKGROUND set yield to everything else.
+    """
+    def __init__(self, limit=20, limit_per_host=8, dns_ttl=300, keepalive_timeout=60, timeout=10, match_store=None, profile_ttl=6 * 3600,
+                 api_key=None, per_minute=60, per_day=2000, daily_reserve=50, max_retries=3, max_wait=30):
+        self.api_key = api_key
+        self.limiter = QuotaLimiter(per_minute, per_day, daily_reserve=daily_reserve)
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.match_store = match_store
+        self.profile_ttl = profile_ttl
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._session = None
+        self._inflight_matches = {}
+        # Per-URL (etag, last_modified, body fingerprint, parsed data) for conditional GETs
+        self._conditional_cache = {}
+        # steam_id -> (fetched_at, profile) for /players/{id}
+        self._profiles = {}
+        self._profile_refreshes = {}
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Returns the shared session, creating it on first use inside the running loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _fetch(self, path, params=None, headers=None):
+        """
+        Rate-limited GET. Returns (status, headers, body); body is None unless the status is 200.
+        429s and gateway errors are retried with backoff while the wait fits in max_wait.
+        """
+        if self.api_key:
+            params = {**(params or {}), 'api_key': self.api_key}
+        for attempt in range(self.max_retries + 1):
+            if not await self.limiter.acquire(self.max_wait, BACKGROUND.get()):
+                return 429, {}, None
+            async with self.session.get(f"{OPENDOTA_API}{path}", params=params, headers=headers) as r:
+                self.limiter.observe(r.status, r.headers)
+                if r.status == 200:
+                    return 200, r.headers, await r.read()
+                if r.status not in RETRY_STATUSES or attempt == self.max_retries:
+                    return r.status, r.headers, None
+                status = r.status
+            # A 429 already closed the limiter until its Retry-After
+            if status != 429:
+                await asyncio.sleep(min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0))
+        return status, {}, None
+
+    def should_yield(self):
+        """True when background polling should put off checks that can wait (commands are busy or the budget is low)."""
+        return self.limiter.contended()
+
+    def budget(self):
+        """Requests left in the current quota: {'minute': n, 'day': n or None, 'blocked_for': seconds}."""
+        return self.limiter.remaining()
+
+    async def get_json(self, path, params=None, conditional=False):
+        """
+        GETs an OpenDota API path (e.g. "/heroes").
+        Returns (status, data); data is None for any non-200 response.
+        With conditional=True, the previous response's validators are sent
+        (If-None-Match / If-Modified-Since) and an unchanged body is not
+        decoded again; either way the previously parsed data is returned.
+        """
+        if not conditional:
+            status, _, body = await self._fetch(path, params)
+            if status != 200:
+                return status, None
+            return status, json.loads(body)
+
+        key = (path, tuple(sorted((params or {}).items())))
+        cached = self._conditional_cache.get(key)
+        headers = {}
+        if cached:
+            etag, last_modified, _, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        status, response_headers, body = await self._fetch(path, params, headers)
+        if status == 304 and cached:
+            return 200, cached[3]
+        if status != 200:
+            return status, None
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+
+        fingerprint = hashlib.blake2b(body, digest_size=16).digest()
+        if cached and cached[2] == fingerprint:
+            data = cached[3]
+        else:
+            data = json.loads(body)
+        self._conditional_cache[key] = (etag, last_modified, fingerprint, data)
+        return 200, data
+
+    async def get_match(self, match_id):
+        """
+        Fetches /matches/{match_id}, serving it from the match store when possible.
+        Concurrent callers for the same match share a single request and JSON parse.
+        """
+        key = str(match_id)
+        task = self._inflight_matches.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load_match(key))
+            self._inflight_matches[key] = task
+            task.add_done_callback(lambda _: self._inflight_matches.pop(key, None))
+        # Shielded so one caller timing out doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def _load_match(self, key):
+        if self.match_store is not None:
+            try:
+                cached = await asyncio.to_thread(self.match_store.get, key)
+            except Exception as e:
+                print(f"Match store read failed for {key}: {e}")
+                cached = None
+            if cached is not None:
+                return 200, cached
+
+        status, data = await self.get_json(f"/matches/{key}")
+        # Only keep complete results, an unfinished payload has no winner yet
+        if status == 200 and data and self.match_store is not None and data.get('players') and data.get('radiant_win') is not None:
+            try:
+                await asyncio.to_thread(self.match_store.put, key, data)
+            except Exception as e:
+                print(f"Match store write failed for {key}: {e}")
+        return status, data
+
+    async def get_player(self, steam_id):
+        """
+        Returns (status, profile) for /players/{steam_id}.
+        Cached profiles are served immediately; once older than profile_ttl
+        they are still returned while a background refresh fetches a new copy.
+        """
+        key = str(steam_id)
+        cached = self._profiles.get(key)
+        if cached is None:
+            return await self._refresh_player(key)
+        fetched_at, profile = cached
+        if time.monotonic() - fetched_at > self.profile_ttl and key not in self._profile_refreshes:
+            task = asyncio.ensure_future(_in_background(self._refresh_player(key)))
+            self._profile_refreshes[key] = task
+            task.add_done_callback(lambda t: self._finish_profile_refresh(key, t))
+        return 200, profile
+
+    async def _refresh_player(self, key):
+        status, profile = await self.get_json(f"/players/{key}")
+        if status == 200 and profile:
+            self._profiles[key] = (time.monotonic(), profile)
+        return status, profile
+
+    def _finish_profile_refresh(self, key, task):
+        self._profile_refreshes.pop(key, None)
+        if not task.cancelled() and task.exception():
+            print(f"Background profile refresh failed for {key}: {task.exception()}")
+
+    async def close(self):
+        for task in list(self._profile_refreshes.values()):
+            task.cancel()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self.match_store is not None:
+            self.match_store.close()
+            self.match_store = None
+
+async def _in_background(coro):
+    # Runs in its own task, so this only lowers the priority of that task's requests
+    BACKGROUND.set(True)
+    return await coro
+
 def get_rank_name(p_data, rank_names_map):
     """
     Takes the full player data dictionary from OpenDota 
@@ -42,96 +251,45 @@ def get_rank_name(p_data, rank_names_map):
         
     return f"{name} {stars}"
 
-async def update_hero_data(hero_names, hero_image_keys, hero_lookup, hero_roles):
-    """
-    Fetches all hero data from the OpenDota API and updates the provided hero dictionaries.
-    """
-    async with aiohttp.ClientSession() as session:
-        async with session.get("https://api.opendota.com/api/heroes") as r:
-            if r.status == 200:
-                h_data = await r.json()
-                for h in h_data:
-                    h_id = h['id']
-                    localized = h['localized_name']
-                    img_key = h['name'].replace('npc_dota_hero_', '')
-                    hero_names[h_id] = localized
-                    hero_image_keys[h_id] = img_key
-                    hero_lookup[localized.lower()] = img_key
-                    hero_lookup[img_key.lower()] = img_key
-                    hero_roles[h_id] = h.get('roles', [])
-                print("✅ Hero data updated successfully.")
-            else:
-                print("❌ Failed to update hero data.")
+def classify_performance(kills, deaths, assists, won):
+    """Returns the (status, color, message key) alert label for a KDA line and result."""
+    kda = (kills + assists) / max(1, deaths)
+    if not won:
+        if kda >= 2.5 and deaths <= 14:
+            return "ZOO KEEPER ALERT", 0xf1c40f, "uncarryable"
+        if kda >= 1.4 and deaths <= 14:
+            return "DID HIS BEST ALERT", 0xe67e22, "tried_hard"
+        return "FEEDER ALERT", 0xe74c3c, "feeder"
+    if kda >= 3.5:
+        return "SMURF ALERT", 0x2ecc71, "smurf_alert"
+    if assists >= 23 and deaths <= 6:
+        return "SUPPORT SMURF ALERT", 0x1abc9c, "super_support"
+    if kda >= 1.4 and deaths <= 14:
+        return "SOLID PERFORMANCE ALERT", 0x1abc9c, "solid_performance"
+    return "PASSENGER ALERT", 0x3498db, "carried"
 
 def get_match_analysis(player_match_data, won, team_stats, enemy_team_stats, hero_roles, messages):
     """
     Analyzes a match based on KDA, win/loss, and comparison with team stats.
     Approximates player role based on farm priority.
     """
-    kills = player_match_data.get('kills', 0)
-    deaths = player_match_data.get('deaths', 0)
-    assists = player_match_data.get('assists', 0)
-    kda = (kills + assists) / max(1, deaths)
-
     # Basic analysis based on old system
-    if not won:
-        if kda >= 2.5 and deaths <= 14:
-            base_status, base_color, base_msg_key = "ZOO KEEPER ALERT", 0xf1c40f, "uncarryable"
-        elif kda >= 1.4 and deaths <= 14:
-            base_status, base_color, base_msg_key = "DID HIS BEST ALERT", 0xe67e22, "tried_hard"
-        else:
-            base_status, base_color, base_msg_key = "FEEDER ALERT", 0xe74c3c, "feeder"
-    else:  # Won
-        if kda >= 3.5:
-            base_status, base_color, base_msg_key = "SMURF ALERT", 0x2ecc71, "smurf_alert"
-        elif assists >= 23 and deaths <= 6:
-            base_status, base_color, base_msg_key = "SUPPORT SMURF ALERT", 0x1abc9c, "super_support"
-        elif kda >= 1.4 and deaths <= 14:
-            base_status, base_color, base_msg_key = "SOLID PERFORMANCE ALERT", 0x1abc9c, "solid_performance"
-        else:
-            base_status, base_color, base_msg_key = "PASSENGER ALERT", 0x3498db, "carried"
+    base_status, base_color, base_msg_key = classify_performance(
+        player_match_data.get('kills', 0), player_match_data.get('deaths', 0), player_match_data.get('assists', 0), won
+    )
 
     # --- Advanced Analysis ---
-    highlights = []
-    
-    # Role approximation based on net worth (farm priority)
+    # Role approximation (farm priority) and highlights come from the match's ranked frame
+    frame = team_stats.get('frame')
+    if frame is None and team_stats.get('players'):
+        frame = MatchFrame(team_stats['players'] + enemy_team_stats.get('players', []))
+    row = frame.index_of(player_match_data) if frame is not None else None
+
     approximated_role = "Unknown"
-    if team_stats.get('players'):
-        try:
-            team_players_sorted_by_farm = sorted(team_stats['players'], key=lambda p: (p.get('last_hits', 0), p.get('denies', 0)), reverse=True)
-            player_account_id = player_match_data.get('account_id')
-            
-            for i, player in enumerate(team_players_sorted_by_farm):
-                if str(player.get('account_id')) == str(player_account_id):
-                    position = i + 1
-                    if position == 1:
-                        approximated_role = "Carry"
-                    elif position == 2:
-                        approximated_role = "Midlaner"
-                    elif position == 3:
-                        approximated_role = "Offlaner"
-                    else: # Position 4 and 5
-                        approximated_role = "Support"
-                    break
-        except Exception as e:
-            print(f"Error during role approximation: {e}")
-
-    # Performance highlights
-    if team_stats.get('players'):
-        if player_match_data.get('gold_per_min', 0) >= max(p.get('gold_per_min', 0) for p in team_stats['players']):
-            highlights.append("💰 Top GPM on team")
-        if player_match_data.get('hero_damage', 0) >= max(p.get('hero_damage', 0) for p in team_stats['players']):
-            highlights.append("💥 Top hero damage on team")
-        if player_match_data.get('tower_damage', 0) > max(p.get('tower_damage', 0) for p in team_stats['players']):
-            highlights.append("🗼 Top tower damage on team")
-        if player_match_data.get('kills', 0) >= max(p.get('kills', 0) for p in team_stats['players']):
-            highlights.append("🔪 Most kills on team")
-    
-    if team_stats.get('total_kills', 0) > 0:
-        kill_participation = (kills + assists) / team_stats['total_kills']
-        kill_participation = min(1.0, kill_participation) # Cap at 100%
-        if kill_participation > 0.65:
-            highlights.append(f"⚔️ Involved in {kill_participation:.0%} of team's kills")
+    highlights = []
+    if row is not None:
+        approximated_role = frame.roles[row]
+        highlights = frame.highlights(row, team_stats.get('total_kills', 0))
 
     return {
         "status": base_status,
@@ -141,86 +299,238 @@ def get_match_analysis(player_match_data, won, team_stats, enemy_team_stats, her
         "highlights": highlights
     }
 
-def calculate_team_metrics(players):
-    """Calculates aggregate and average stats for a list of players."""
-    metrics = {
-        'total_kills': 0, 'total_gpm': 0, 'total_lh': 0, 'total_xpm': 0,
-        'total_hero_damage': 0, 'avg_gpm': 0, 'avg_lh': 0, 'avg_xpm': 0,
-        'avg_hero_damage': 0, 'players': players
-    }
-    
-    player_count = len(players)
-    if not players or player_count == 0:
-        return metrics
-
-    for p in players:
-        metrics['total_kills'] += p.get('kills', 0)
-        metrics['total_gpm'] += p.get('gold_per_min', 0)
-        metrics['total_lh'] += p.get('last_hits', 0)
-        metrics['total_xpm'] += p.get('xp_per_min', 0)
-        metrics['total_hero_damage'] += p.get('hero_damage', 0)
-    
-    metrics['avg_gpm'] = metrics['total_gpm'] / player_count
-    metrics['avg_lh'] = metrics['total_lh'] / player_count
-    metrics['avg_xpm'] = metrics['total_xpm'] / player_count
-    metrics['avg_hero_damage'] = metrics['total_hero_damage'] / player_count
-    
-    return metrics
+def analyze_lobby(d_data):
+    """
+    Grades and labels all players of a match in one pass over a single MatchFrame.
+    Returns one dict per player (in match order) with the same keys as get_match_analysis,
+    plus hero_id, account_id, is_radiant, won, kda, grade and avg_rank.
+    """
+    frame = MatchFrame(d_data.get('players', []))
+    radiant_win = d_data.get('radiant_win', False)
+    kills, deaths, assists = frame.columns['kills'], frame.columns['deaths'], frame.columns['assists']
+    team_kills = {radiant: frame.team_metrics(radiant)['total_kills'] for radiant in (True, False)}
+
+    results = []
+    for i, player in enumerate(frame.players):
+        radiant = frame.is_radiant[i]
+        won = radiant == radiant_win
+        status, color, msg_key = classify_performance(kills[i], deaths[i], assists[i], won)
+        grade, avg_rank = frame.grade(i)
+        results.append({
+            "status": status,
+            "color": color,
+            "msg_key": msg_key,
+            "approximated_role": frame.roles[i],
+            "highlights": frame.highlights(i, team_kills[radiant]),
+            "hero_id": player.get('hero_id'),
+            "account_id": player.get('account_id'),
+            "is_radiant": radiant,
+            "won": won,
+            "kda": f"{kills[i]}/{deaths[i]}/{assists[i]}",
+            "grade": grade,
+            "avg_rank": avg_rank,
+        })
+    return results
+
+async def get_latest_match_id(client: OpenDotaClient, steam_id):
+    """Returns the id of the player's most recent match."""
+    # Only the newest match id is needed, so ask for a one-row projection and reuse it when unchanged
+    status, m_data = await client.get_json(
+        f"/players/{steam_id}/matches",
+        params={'limit': 1, 'significant': 0, 'project': 'match_id'},
+        conditional=True,
+    )
+    if status == 429:
+        raise RateLimitException("OpenDota API rate limit reached.")
+    if status != 200:
+        raise PlayerDataException(f"API Error (status {status})")
+    if not m_data:
+        raise NoMatchesException("No recent matches found.")
+    return m_data[0]['match_id']
+
+def resolve_mention(guild: discord.Guild, discord_id, member_names_map):
+    """Returns a mention for the member, or their bolded friendly name if they can't be found. Never blocks."""
+    return members.MEMBERS.mention(guild, discord_id, member_names_map)
 
-async def create_match_embed(session: aiohttp.ClientSession, steam_id: str, discord_id: str, guild: discord.Guild, last_match_cache, hero_names, hero_image_keys, hero_roles, rank_names_map, member_names_map, messages_map, last_known_match_id=None):
+class MatchSnapshot:
     """
-    Fetches the latest match for a user, processes it, and creates a Discord embed.
+    Parsed and analyzed data for a player's latest match.
+    Embeds (and their image files) are only built when a caller asks for one.
+    """
+    __slots__ = ('steam_id', 'discord_id', 'match_id', 'player_match_data', 'analysis', 'team_stats', 'enemy_team_stats', 'profile', 'won')
+
+    def __init__(self, steam_id, discord_id, match_id, player_match_data, analysis, team_stats, enemy_team_stats, profile, won):
+        self.steam_id = steam_id
+        self.discord_id = discord_id
+        self.match_id = match_id
+        self.player_match_data = player_match_data
+        self.analysis = analysis
+        self.team_stats = team_stats
+        self.enemy_team_stats = enemy_team_stats
+        self.profile = profile
+        self.won = won
+
+    @property
+    def hero_id(self):
+        return self.player_match_data.get('hero_id')
+
+    @property
+    def kda(self):
+        p = self.player_match_data
+        return f"{p.get('kills', 0)}/{p.get('deaths', 0)}/{p.get('assists', 0)}"
+
+    async def to_alert_embed(self, guild: discord.Guild, hero_names, hero_image_keys, rank_names_map, member_names_map, messages_map):
+        """Builds the match alert embed. Returns (embed, image_file)."""
+        m_id = self.match_id
+        h_name = hero_names.get(self.hero_id, "Unknown Hero")
+        h_gpm = self.player_match_data.get('gold_per_min', 0)
+        h_xpm = self.player_match_data.get('xp_per_min', 0)
+        analysis = self.analysis
+
+        messages_list = messages_map.get(analysis['msg_key'], ["Error: No messages found for this status."])
+        flavor = random.choice(messages_list)
+
+        friendly_name = member_names_map.get(str(self.discord_id), "Dota Player")
+        mention_text = resolve_mention(guild, self.discord_id, member_names_map)
+
+        embed = discord.Embed(title=f"🚨 {analysis['status']}", color=analysis['color'])
+        embed.description = f"{mention_text} just played as **{h_name}**.\n**{flavor}**"
+        
+        # Set Steam Avatar and Name
+        try:
+            steam_profile = self.profile.get('profile', {})
+            steam_name = steam_profile.get('personaname', friendly_name)
+            avatar_url = steam_profile.get('avatarfull')
+            
+            if avatar_url:
+                embed.set_author(name=steam_name, icon_url=avatar_url, url=steam_profile.get('profileurl', ''))
+            else:
+                embed.set_author(name=steam_name)
+        except Exception as e:
+            print(f"Error setting author in embed: {e}")
+            embed.set_author(name=friendly_name)
+
+        image_file = assets.PORTRAITS.thumbnail(embed, hero_image_keys.get(self.hero_id, ""))
+
+        embed.add_field(name="Result", value="🏆 WON" if self.won else "💀 LOST", inline=True)
+        embed.add_field(name="KDA", value=f"`{self.kda}`", inline=True)
+        embed.add_field(name="Approximated Role", value=analysis.get('approximated_role', 'N/A'), inline=True)
+        embed.add_field(name="GPM / XPM", value=f"{h_gpm} / {h_xpm}", inline=True)
+        embed.add_field(name="Current Rank", value=get_rank_name(self.profile, rank_names_map), inline=True)
+        
+        if analysis['highlights']:
+            embed.add_field(name="📋 Match Highlights", value="\n".join(analysis['highlights']), inline=False)
+
+        embed.add_field(
+            name="Match Details", 
+            value=f"[Dotabuff](https://www.dotabuff.com/matches/{m_id}) | [OpenDota](https://www.opendota.com/matches/{m_id})",
+            inline=False
+        )
+        return embed, image_file
+
+    def to_status_embed(self, display_name, hero_names, hero_image_keys):
+        """Builds the detailed !status embed comparing the player to the whole lobby. Returns (embed, image_file)."""
+        player_match_data = self.player_match_data
+        analysis = self.analysis
+        h_name = hero_names.get(self.hero_id, "Unknown Hero")
+
+        embed = discord.Embed(
+            title=f"📊 Match Status for {display_name} as {h_name}",
+            color=discord.Color.blue()
+        )
+        image_file = assets.PORTRAITS.thumbnail(embed, hero_image_keys.get(self.hero_id, ""))
+
+        gpm = player_match_data.get('gold_per_min', 0)
+        xpm = player_match_data.get('xp_per_min', 0)
+        lh = player_match_data.get('last_hits', 0)
+        hd = player_match_data.get('hero_damage', 0)
+        td = player_match_data.get('tower_damage', 0)
+
+        embed.add_field(name="Result", value="🏆 WON" if self.won else "💀 LOST", inline=True)
+        embed.add_field(name="KDA", value=f"`{self.kda}`", inline=True)
+        embed.add_field(name="Approximated Role", value=analysis.get('approximated_role', 'N/A'), inline=True)
+
+        # Comparative Analysis
+        frame = self.team_stats.get('frame') if self.team_stats else None
+        row = frame.index_of(player_match_data) if frame is not None else None
+        if row is not None and self.enemy_team_stats and self.enemy_team_stats.get('players'):
+            # Grade based on Role, from the ranks computed once for the whole match
+            grade, avg_rank = frame.grade(row, analysis.get('approximated_role', 'Unknown'))
+            embed.add_field(name="🏆 Match Grade", value=f"**{grade}** (Avg Rank: #{avg_rank:.1f}/{len(frame)})", inline=False)
+
+            def format_stat(key):
+                val = frame.columns[key][row]
+                rank = frame.ranks[key][row]
+                if rank == 1:
+                    return f"**{val}**\n🥇 Match Leader!"
+                top = frame.leader(key)
+                top_hero = hero_names.get(frame.players[top].get('hero_id'), "Unknown")
+                return f"**{val}**\nRank #{rank}\n(Top: {frame.columns[key][top]} by {top_hero})"
+
+            embed.add_field(name="GPM", value=format_stat('gold_per_min'), inline=True)
+            embed.add_field(name="XPM", value=format_stat('xp_per_min'), inline=True)
+            embed.add_field(name="Hero Damage", value=format_stat('hero_damage'), inline=True)
+            embed.add_field(name="Tower Damage", value=format_stat('tower_damage'), inline=True)
+            embed.add_field(name="Last Hits", value=format_stat('last_hits'), inline=True)
+            embed.add_field(name="\u200b", value="\u200b", inline=True) # Spacer for alignment
+
+        else:
+            # Fallback if detailed stats fail
+            embed.add_field(
+                name="Performance",
+                value=f"**GPM:** {gpm}\n"
+                      f"**XPM:** {xpm}\n"
+                      f"**Last Hits:** {lh}\n"
+                      f"**Hero Damage:** {hd}\n"
+                      f"**Tower Damage:** {td}",
+                inline=False
+            )
+
+        if analysis['highlights']:
+            embed.add_field(name="📋 Match Highlights", value="\n".join(analysis['highlights']), inline=False)
+
+        return embed, image_file
+
+async def fetch_match_snapshot(client: OpenDotaClient, steam_id: str, discord_id: str, last_match_cache, hero_names, hero_roles, messages_map, last_known_match_id=None):
+    """
+    Fetches and analyzes the latest match for a user, without rendering anything.
     Raises exceptions for API errors, rate limits, or no data.
-    Returns the embed, an image file (if any), and the match ID on success.
-    If last_known_match_id is provided and matches the latest match, returns None for embed/image.
+    Returns a MatchSnapshot, or None if last_known_match_id is still the latest match.
     """
-    recent_matches_url = f"https://api.opendota.com/api/players/{steam_id}/recentMatches"
-    async with session.get(recent_matches_url, timeout=10) as r_match:
-        if r_match.status == 429:
-            raise RateLimitException("OpenDota API rate limit reached.")
-        if r_match.status != 200:
-            raise PlayerDataException(f"API Error (status {r_match.status})")
-        m_data = await r_match.json()
-        if not m_data:
-            raise NoMatchesException("No recent matches found.")
-    
-    m_id = m_data[0]['match_id']
+    m_id = await get_latest_match_id(client, steam_id)
 
     # Optimization: Skip detailed fetch if match hasn't changed
     if last_known_match_id and str(m_id) == str(last_known_match_id):
-        return None, None, m_id, None, None, None, None
+        return None
 
-    player_url = f"https://api.opendota.com/api/players/{steam_id}"
-    p_data = {}
-    async with session.get(player_url, timeout=10) as r_player:
-        if r_player.status == 200:
-            p_data = await r_player.json()
+    # Profile and match details are independent, fetch them concurrently
+    (p_status, p_data), (d_status, d_data) = await asyncio.gather(
+        client.get_player(steam_id),
+        client.get_match(m_id),
+    )
+    if p_status != 200 or not p_data:
+        p_data = {}
+    if d_status == 429:
+        raise RateLimitException("OpenDota API rate limit reached.")
 
     player_match_data = None
     team_stats = {}
     enemy_team_stats = {}
     player_team = None
 
-    async with session.get(f"https://api.opendota.com/api/matches/{m_id}", timeout=10) as r_detail:
-        if r_detail.status == 200:
-            d_data = await r_detail.json()
-
-            # Find the player and their team first
-            for p in d_data.get('players', []):
-                if p.get('account_id') is not None and str(p.get('account_id')) == str(steam_id):
-                    player_match_data = p
-                    player_team = 'radiant' if p['player_slot'] < 128 else 'dire'
-                    break
-            
-            if player_team:
-                radiant_players = [p for p in d_data.get('players', []) if p['player_slot'] < 128]
-                dire_players = [p for p in d_data.get('players', []) if p['player_slot'] >= 128]
-
-                my_team_players = radiant_players if player_team == 'radiant' else dire_players
-                enemy_team_players = dire_players if player_team == 'radiant' else radiant_players
-                
-                team_stats = calculate_team_metrics(my_team_players)
-                enemy_team_stats = calculate_team_metrics(enemy_team_players)
+    if d_status == 200 and d_data:
+        # Find the player and their team first
+        for p in d_data.get('players', []):
+            if p.get('account_id') is not None and str(p.get('account_id')) == str(steam_id):
+                player_match_data = p
+                player_team = 'radiant' if p['player_slot'] < 128 else 'dire'
+                break
+        
+        if player_team:
+            # Rank every stat for all ten players once; team stats and analysis read from it
+            frame = MatchFrame(d_data.get('players', []))
+            team_stats = frame.team_metrics(player_team == 'radiant')
+            enemy_team_stats = frame.team_metrics(player_team != 'radiant')
 
     if not player_match_data:
          raise PlayerDataException("Could not find player's match data in detailed match info.")
@@ -233,70 +543,53 @@ async def create_match_embed(session: aiohttp.ClientSession, steam_id: str, disc
         print(f"WARNING: Unknown hero_id '{hero_id}' encountered.")
 
     won = (player_match_data.get('player_slot', 0) < 128) == player_match_data.get('radiant_win', False)
+    analysis = get_match_analysis(player_match_data, won, team_stats, enemy_team_stats, hero_roles, messages_map)
+    snapshot = MatchSnapshot(steam_id, discord_id, m_id, player_match_data, analysis, team_stats, enemy_team_stats, p_data, won)
+
     h_name = hero_names.get(hero_id, "Unknown Hero")
-    h_key = hero_image_keys.get(hero_id, "")
-    kda = f"{player_match_data.get('kills', 0)}/{player_match_data.get('deaths', 0)}/{player_match_data.get('assists', 0)}"
-    rank_str = get_rank_name(p_data, rank_names_map)
-    h_xpm = player_match_data.get('xp_per_min', 0)
-    h_gpm = player_match_data.get('gold_per_min', 0)
-    
     result_str = "WON" if won else "LOST"
-    match_summary = f"Last Game: {h_name}, {result_str}, {h_gpm} GPM, {h_xpm} XPM, KDA: {kda}"
-    last_match_cache[str(discord_id)] = match_summary
-    
-    analysis = get_match_analysis(player_match_data, won, team_stats, enemy_team_stats, hero_roles, messages_map)
-    messages_list = messages_map.get(analysis['msg_key'], ["Error: No messages found for this status."])
-    flavor = random.choice(messages_list)
-
-    friendly_name = member_names_map.get(str(discord_id), "Dota Player")
-    member = guild.get_member(int(discord_id))
-    if not member:
-        try: member = await guild.fetch_member(int(discord_id))
-        except: member = None
-    mention_text = member.mention if member else f"**{friendly_name}**"
-
-    embed = discord.Embed(title=f"🚨 {analysis['status']}", color=analysis['color'])
-    embed.description = f"{mention_text} just played as **{h_name}**.\n**{flavor}**"
-    
-    # Set Steam Avatar and Name
-    try:
-        steam_profile = p_data.get('profile', {})
-        steam_name = steam_profile.get('personaname', friendly_name)
-        avatar_url = steam_profile.get('avatarfull')
-        
-        if avatar_url:
-            embed.set_author(name=steam_name, icon_url=avatar_url, url=steam_profile.get('profileurl', ''))
-        else:
-            embed.set_author(name=steam_name)
-    except Exception as e:
-        print(f"Error setting author in embed: {e}")
-        embed.set_author(name=friendly_name)
-
-    image_file = None
-    if h_key:
-        image_path = f"images/{h_key}.png"
-        if os.path.exists(image_path):
-            try:
-                image_file = discord.File(image_path, filename=f"{h_key}.png")
-                embed.set_thumbnail(url=f"attachment://{h_key}.png")
-            except Exception as e:
-                print(f"ERROR: Failed to create discord.File for {image_path}: {e}")
-        else:
-            embed.set_thumbnail(url=f"https://api.opendota.com/apps/dota2/images/dota_react/heroes/{h_key}.png")
+    last_match_cache[str(discord_id)] = (
+        f"Last Game: {h_name}, {result_str}, {player_match_data.get('gold_per_min', 0)} GPM, "
+        f"{player_match_data.get('xp_per_min', 0)} XPM, KDA: {snapshot.kda}"
+    )
+    return snapshot
 
-    embed.add_field(name="Result", value="🏆 WON" if won else "💀 LOST", inline=True)
-    embed.add_field(name="KDA", value=f"`{kda}`", inline=True)
-    embed.add_field(name="Approximated Role", value=analysis.get('approximated_role', 'N/A'), inline=True)
-    embed.add_field(name="GPM / XPM", value=f"{h_gpm} / {h_xpm}", inline=True)
-    embed.add_field(name="Current Rank", value=rank_str, inline=True)
-    
-    if analysis['highlights']:
-        embed.add_field(name="📋 Match Highlights", value="\n".join(analysis['highlights']), inline=False)
+
+def create_party_embed(party, hero_names):
+    """
+    Builds one combined embed for several tracked players who played the same match.
+    `party` is a list of (mention_text, player_match_data, analysis) tuples.
+    """
+    m_id = party[0][1].get('match_id')
+    results = []
+    for mention_text, player_match_data, analysis in party:
+        won = (player_match_data.get('player_slot', 0) < 128) == player_match_data.get('radiant_win', False)
+        results.append((mention_text, player_match_data, analysis, won))
+
+    if all(won for *_, won in results):
+        color = 0x2ecc71
+    elif not any(won for *_, won in results):
+        color = 0xe74c3c
+    else:
+        color = 0xf1c40f
+
+    embed = discord.Embed(title="🚨 PARTY REPORT", color=color)
+    embed.description = f"{len(results)} of you queued together. Here's the damage."
+
+    for mention_text, player_match_data, analysis, won in results:
+        h_name = hero_names.get(player_match_data.get('hero_id'), "Unknown Hero")
+        kda = f"{player_match_data.get('kills', 0)}/{player_match_data.get('deaths', 0)}/{player_match_data.get('assists', 0)}"
+        embed.add_field(
+            name=f"{h_name} — {analysis['status']}",
+            value=f"{mention_text}\n{'🏆 WON' if won else '💀 LOST'} | KDA `{kda}` | "
+                  f"{player_match_data.get('gold_per_min', 0)} / {player_match_data.get('xp_per_min', 0)} GPM/XPM | "
+                  f"{analysis.get('approximated_role', 'N/A')}",
+            inline=False
+        )
 
     embed.add_field(
         name="Match Details", 
         value=f"[Dotabuff](https://www.dotabuff.com/matches/{m_id}) | [OpenDota](https://www.opendota.com/matches/{m_id})",
         inline=False
     )
-    
-    return embed, image_file, m_id, player_match_data, analysis, team_stats, enemy_team_stats
+    return embed
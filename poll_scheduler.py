@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import random
+import time
+
+
+class _PlayerState:
+    __slots__ = ('due', 'idle_polls', 'last_new_match')
+
+    def __init__(self, due):
+        self.due = due
+        self.idle_polls = 0
+        self.last_new_match = None
+
+
+class PollScheduler:
+    """
+    Priority queue of next-poll times per steam id.
+    Players who just finished a match are polled every `active_interval` seconds
+    for `session_window` seconds; after that, each poll that finds nothing new
+    doubles the wait (starting at `base_interval`, capped at `max_interval`).
+    Every interval is jittered so polls don't all land on the same tick.
+    """
+    def __init__(self, active_interval=120, base_interval=300, max_interval=3600, session_window=7200, backoff=2.0, jitter=0.2, clock=time.monotonic):
+        self.active_interval = active_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.session_window = session_window
+        self.backoff = backoff
+        self.jitter = jitter
+        self.clock = clock
+        self._players = {}
+        self._heap = []
+        self._seq = itertools.count()
+
+    def _push(self, steam_id, state, delay):
+        state.due = self.clock() + delay
+        heapq.heappush(self._heap, (state.due, next(self._seq), steam_id))
+
+    def _jittered(self, interval):
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _in_session(self, state):
+        return state.last_new_match is not None and self.clock() - state.last_new_match < self.session_window
+
+    def _interval(self, state):
+        if self._in_session(state):
+            return self.active_interval
+        return min(self.max_interval, self.base_interval * (self.backoff ** state.idle_polls))
+
+    def sync(self, steam_ids):
+        """Starts tracking new steam ids (spread over the first active interval) and forgets removed ones."""
+        steam_ids = set(steam_ids)
+        for steam_id in list(self._players):
+            if steam_id not in steam_ids:
+                del self._players[steam_id]
+        for steam_id in steam_ids:
+            if steam_id not in self._players:
+                state = _PlayerState(0)
+                self._players[steam_id] = state
+                self._push(steam_id, state, random.uniform(0, self.active_interval))
+
+    def due(self):
+        """Pops and returns every steam id whose next poll time has passed."""
+        now = self.clock()
+        ready = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _, steam_id = heapq.heappop(self._heap)
+            state = self._players.get(steam_id)
+            # Skip entries left behind by removed players or rescheduled polls
+            if state is None or state.due != due:
+                continue
+            ready.append(steam_id)
+        return ready
+
+    def record(self, steam_id, new_match=False, failed=False):
+        """Reschedules a player after a poll."""
+        state = self._players.get(steam_id)
+        if state is None:
+            return
+        if failed:
+            # Errors say nothing about activity, retry at the normal cadence
+            self._push(steam_id, state, self._jittered(self.base_interval))
+            return
+        if new_match:
+            state.last_new_match = self.clock()
+            state.idle_polls = 0
+        delay = self._interval(state)
+        if not self._in_session(state):
+            state.idle_polls += 1
+        self._push(steam_id, state, self._jittered(delay))
+
+    def in_session(self, steam_id):
+        """True if the player found a new match within the last session_window seconds."""
+        state = self._players.get(steam_id)
+        return state is not None and self._in_session(state)
+
+    def defer(self, steam_id, delay):
+        """Puts a due poll off by about `delay` seconds without counting it as an idle poll."""
+        state = self._players.get(steam_id)
+        if state is not None:
+            self._push(steam_id, state, self._jittered(delay))
@@ -0,0 +1,151 @@
+import asyncio
+import random
+import time
+
+
+class TokenBucket:
+    """`capacity` requests per `period` seconds, refilled continuously."""
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, period, now):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now, reserve=0.0):
+        """Seconds until a token is available while keeping `reserve` tokens untouched."""
+        self._refill(now)
+        needed = 1 + reserve
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def clamp(self, remaining, now):
+        """Trusts the server's count when it says fewer requests are left than we think."""
+        self._refill(now)
+        self.tokens = min(self.tokens, float(remaining))
+
+
+class QuotaLimiter:
+    """
+    OpenDota's per-minute and per-day quotas as two token buckets.
+    Buckets are corrected from the X-Rate-Limit-Remaining-* response headers,
+    and a 429 closes the gate until its Retry-After (or a jittered
+    exponential backoff) has passed. Callers that would have to wait longer
+    than they are willing to are turned away instead of burning a request.
+
+    Background requests queue behind any waiting interactive request and
+    leave the last `reserve` fraction of the minute bucket, and the last
+    `daily_reserve` requests of the day, to interactive ones.
+    """
+    def __init__(self, per_minute=60, per_day=2000, backoff_base=2.0, backoff_max=60.0, reserve=0.25, daily_reserve=50, interactive_window=10.0, clock=time.monotonic):
+        self.clock = clock
+        self.reserve = reserve
+        self.daily_reserve = daily_reserve
+        self.interactive_window = interactive_window
+        self._interactive_waiting = 0
+        self._last_interactive = None
+        now = clock()
+        self.minute = TokenBucket(per_minute, 60, now)
+        # per_day=0 means no daily cap (e.g. with a premium API key)
+        self.day = TokenBucket(per_day, 86400, now) if per_day else None
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._blocked_until = 0.0
+        self._strikes = 0
+
+    def wait_time(self, background=False):
+        """Seconds until the next request may go out."""
+        now = self.clock()
+        minute_reserve = self.reserve * self.minute.capacity if background else 0.0
+        wait = max(self._blocked_until - now, self.minute.wait_time(now, minute_reserve))
+        if self.day:
+            wait = max(wait, self.day.wait_time(now, self.daily_reserve if background else 0.0))
+        return max(0.0, wait)
+
+    async def acquire(self, max_wait, background=False):
+        """Waits for a request slot. Returns False without waiting if that would take longer than max_wait."""
+        if background:
+            return await self._acquire(max_wait, True)
+        self._interactive_waiting += 1
+        try:
+            return await self._acquire(max_wait, False)
+        finally:
+            self._interactive_waiting -= 1
+            self._last_interactive = self.clock()
+
+    async def _acquire(self, max_wait, background):
+        while True:
+            wait = self.wait_time(background)
+            if background and self._interactive_waiting and wait <= 0:
+                # Let queued interactive requests go first
+                wait = 0.05
+            if wait <= 0:
+                now = self.clock()
+                self.minute.take(now)
+                if self.day:
+                    self.day.take(now)
+                return True
+            if wait > max_wait:
+                return False
+            await asyncio.sleep(wait)
+
+    def contended(self):
+        """
+        True while interactive requests are waiting or were made in the last
+        interactive_window seconds, or while the budget is down to its reserve.
+        Background work that can wait should be put off.
+        """
+        if self._interactive_waiting:
+            return True
+        if self._last_interactive is not None and self.clock() - self._last_interactive < self.interactive_window:
+            return True
+        return self.wait_time(background=True) > 0
+
+    def observe(self, status, headers):
+        """Updates the budget from a response's status and rate-limit headers."""
+        now = self.clock()
+        for name, bucket in (('X-Rate-Limit-Remaining-Minute', self.minute), ('X-Rate-Limit-Remaining-Day', self.day)):
+            value = headers.get(name)
+            if bucket is not None and value is not None:
+                try:
+                    bucket.clamp(int(value), now)
+                except ValueError:
+                    pass
+        if status != 429:
+            self._strikes = 0
+            return
+        retry_after = _parse_retry_after(headers.get('Retry-After'))
+        if retry_after is None:
+            delay = min(self.backoff_max, self.backoff_base * (2 ** self._strikes))
+            retry_after = delay * random.uniform(0.5, 1.0)
+        self._strikes += 1
+        self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def remaining(self):
+        """Requests left right now: {'minute': n, 'day': n or None, 'blocked_for': seconds}."""
+        now = self.clock()
+        self.minute.wait_time(now)
+        if self.day:
+            self.day.wait_time(now)
+        return {
+            'minute': int(self.minute.tokens),
+            'day': int(self.day.tokens) if self.day else None,
+            'blocked_for': max(0.0, self._blocked_until - now),
+        }
+
+
+def _parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+
+import config
+
+# Most Steam accounts one Discord user can link
+MAX_ACCOUNTS = 5
+
+
+class UserRegistry:
+    """
+    Discord id -> linked Steam ids, shared by every module.
+    Changes apply in memory straight away and are written behind: edits made
+    within `flush_delay` seconds of each other go out in one atomic rewrite of
+    the file, off the event loop. Subscribers are told which user changed.
+
+    On disk a user with one account is stored as a plain steam id string
+    (the original users.json format) and a user with several as a list,
+    primary account first.
+    """
+    def __init__(self, path, flush_delay=1.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self._accounts = {}
+        self._tracked = {}
+        self._listeners = []
+        self._dirty = False
+        self._flush_task = None
+
+    def load(self):
+        """Reads the registry file. A missing file is an empty registry."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            raw = json.load(f)
+        accounts = {}
+        for discord_id, steam_ids in raw.items():
+            if isinstance(steam_ids, (str, int)):
+                steam_ids = [steam_ids]
+            accounts[str(discord_id)] = tuple(str(s) for s in steam_ids)
+        self._accounts = accounts
+        self._rebuild()
+        print(f"✅ Loaded {len(accounts)} registered users.")
+
+    def _rebuild(self):
+        tracked = {}
+        for discord_id, steam_ids in self._accounts.items():
+            for steam_id in steam_ids:
+                tracked.setdefault(steam_id, discord_id)
+        self._tracked = tracked
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def get(self, discord_id):
+        """Returns the primary steam id of a Discord user, or None."""
+        steam_ids = self._accounts.get(str(discord_id))
+        return steam_ids[0] if steam_ids else None
+
+    def accounts(self, discord_id):
+        """Returns every steam id linked to a Discord user, primary first."""
+        return self._accounts.get(str(discord_id), ())
+
+    def users(self):
+        """Returns (discord_id, primary steam id) for every registered user."""
+        return [(discord_id, steam_ids[0]) for discord_id, steam_ids in self._accounts.items() if steam_ids]
+
+    def tracked(self):
+        """Returns steam id -> discord id for every linked account. Don't mutate it."""
+        return self._tracked
+
+    def subscribe(self, callback):
+        """Calls callback(discord_id) after every change."""
+        self._listeners.append(callback)
+
+    def _changed(self, discord_id):
+        self._rebuild()
+        for callback in self._listeners:
+            try:
+                callback(discord_id)
+            except Exception as e:
+                print(f"WARNING: Registry listener failed: {e}")
+        self._dirty = True
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+        return self._flush_task
+
+    async def register(self, discord_id, steam_id):
+        """
+        Links a steam id to a Discord user and makes it their primary account.
+        Waits until the change is on disk; raises ValueError past MAX_ACCOUNTS.
+        """
+        discord_id, steam_id = str(discord_id), str(steam_id)
+        steam_ids = [s for s in self.accounts(discord_id) if s != steam_id]
+        if len(steam_ids) >= MAX_ACCOUNTS:
+            raise ValueError(f"at most {MAX_ACCOUNTS} accounts per user")
+        self._accounts[discord_id] = (steam_id, *steam_ids)
+        await asyncio.shield(self._changed(discord_id))
+
+    async def unregister(self, discord_id, steam_id=None):
+        """Unlinks one steam id (or all of them). Returns False if nothing was linked."""
+        discord_id = str(discord_id)
+        steam_ids = self.accounts(discord_id)
+        if steam_id is None:
+            remaining = ()
+        else:
+            remaining = tuple(s for s in steam_ids if s != str(steam_id))
+        if remaining == steam_ids:
+            return False
+        if remaining:
+            self._accounts[discord_id] = remaining
+        else:
+            del self._accounts[discord_id]
+        await asyncio.shield(self._changed(discord_id))
+        return True
+
+    def _serialize(self):
+        return {
+            discord_id: steam_ids[0] if len(steam_ids) == 1 else list(steam_ids)
+            for discord_id, steam_ids in self._accounts.items()
+        }
+
+    async def _flush_later(self):
+        # Loops so a change made while a write is in flight gets its own write
+        while self._dirty:
+            await asyncio.sleep(self.flush_delay)
+            await self.flush()
+
+    async def flush(self):
+        """Writes the current registry to disk now if it has unsaved changes."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        try:
+            await asyncio.to_thread(config.save_json_atomic, self.path, self._serialize())
+        except Exception:
+            self._dirty = True
+            raise
@@ -0,0 +1,109 @@
+import os
+import random
+import time
+from bisect import bisect_left
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SoundLibrary:
+    """
+    Index of the audio files in one directory (sounds/ or greetings/).
+    The directory is re-listed only when its mtime changes, checked at most
+    every `check_interval` seconds, and only added or removed files are
+    re-indexed. Lookups go exact name -> prefix -> substring.
+    """
+    def __init__(self, directory, check_interval=5.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.files = []
+        self.listing = ""
+        self._mtime = None
+        self._checked_at = 0.0
+        self._by_stem = {}
+        self._stems = []
+        self._gram_index = {}
+
+    @staticmethod
+    def _wanted(entry):
+        return entry.is_file() and not entry.name.startswith('.')
+
+    def _add(self, filename):
+        stem = os.path.splitext(filename)[0].lower()
+        self._by_stem.setdefault(stem, filename)
+        for gram in _trigrams(filename.lower()):
+            self._gram_index.setdefault(gram, set()).add(filename)
+
+    def _remove(self, filename):
+        stem = os.path.splitext(filename)[0].lower()
+        if self._by_stem.get(stem) == filename:
+            del self._by_stem[stem]
+        for gram in _trigrams(filename.lower()):
+            names = self._gram_index.get(gram)
+            if names:
+                names.discard(filename)
+                if not names:
+                    del self._gram_index[gram]
+
+    def refresh(self, force=False):
+        """Re-indexes the directory if it changed. Returns True if anything was re-indexed."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            mtime = None
+        if not force and mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        current = set()
+        if mtime is not None:
+            current = {entry.name for entry in os.scandir(self.directory) if self._wanted(entry)}
+        previous = set(self.files)
+        for filename in previous - current:
+            self._remove(filename)
+        for filename in current - previous:
+            self._add(filename)
+
+        self.files = sorted(current)
+        self._stems = sorted(self._by_stem)
+        self.listing = "\n".join(os.path.splitext(f)[0] for f in self.files)
+        return True
+
+    @property
+    def exists(self):
+        self.refresh()
+        return self._mtime is not None
+
+    def find(self, query):
+        """Returns the filename best matching `query`, or None."""
+        self.refresh()
+        search = query.lower()
+        # Prioritize exact match (ignoring extension)
+        if search in self._by_stem:
+            return self._by_stem[search]
+
+        i = bisect_left(self._stems, search)
+        if i < len(self._stems) and self._stems[i].startswith(search):
+            return self._by_stem[self._stems[i]]
+
+        if len(search) >= 3:
+            grams = _trigrams(search)
+            candidates = set.intersection(*(self._gram_index.get(g, set()) for g in grams))
+        else:
+            candidates = self.files
+        matches = sorted(f for f in candidates if search in f.lower())
+        return matches[0] if matches else None
+
+    def choice(self, rng=random):
+        """Returns a random filename, or None if the directory is empty."""
+        self.refresh()
+        return rng.choice(self.files) if self.files else None
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+
+class Startup:
+    """
+    Runs the bot's startup stages concurrently, once per process.
+    Each stage is a coroutine function that starts as soon as the stages it
+    depends on are done; per-stage timings are logged. Commands can wait for
+    just the stages they need instead of the whole sequence.
+    """
+    def __init__(self):
+        self._stages = {}
+        self._done = {}
+        self._tasks = {}
+        self.timings = {}
+        self.started = False
+        self._began = None
+
+    def stage(self, name, after=()):
+        """Decorator registering a coroutine function as a startup stage."""
+        def register(func):
+            self._stages[name] = (func, tuple(after))
+            self._done[name] = asyncio.Event()
+            return func
+        return register
+
+    def run(self):
+        """Schedules every stage. Returns False (and does nothing) if startup already ran."""
+        if self.started:
+            return False
+        self.started = True
+        self._began = time.perf_counter()
+        for name in self._stages:
+            self._tasks[name] = asyncio.ensure_future(self._run_stage(name))
+        return True
+
+    async def _run_stage(self, name):
+        func, after = self._stages[name]
+        for dependency in after:
+            await self._done[dependency].wait()
+        start = time.perf_counter()
+        try:
+            await func()
+        except Exception as e:
+            print(f"❌ Startup stage '{name}' failed: {e}")
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            self._done[name].set()
+        print(f"⏱️ Startup: {name} took {self.timings[name]:.2f}s (ready at +{time.perf_counter() - self._began:.2f}s)")
+
+    def is_done(self, name):
+        event = self._done.get(name)
+        return event is None or event.is_set()
+
+    async def wait(self, names, timeout=None):
+        """Waits for the given stages to finish. Returns False if the timeout ran out first."""
+        pending = [self._done[n].wait() for n in names if not self.is_done(n)]
+        if not pending:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.gather(*pending), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False